@@ -0,0 +1,52 @@
+"""Data versions bumped by triggers
+
+Revision ID: 3b9e2f4c7a10
+Revises: fd717141e1ac
+Create Date: 2026-10-19 09:12:40.518342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9e2f4c7a10'
+down_revision: Union[str, None] = 'fd717141e1ac'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблицы, изменения которых отслеживаются
+TRACKED_TABLES = ('activities', 'buildings', 'organizations', 'organization_activities')
+
+
+def upgrade() -> None:
+    data_versions = op.create_table('data_versions',
+                                    sa.Column('entity', sa.String(), nullable=False),
+                                    sa.Column('version', sa.BigInteger(), nullable=False),
+                                    sa.PrimaryKeyConstraint('entity'))
+    op.bulk_insert(data_versions, [{'entity': table, 'version': 0} for table in TRACKED_TABLES])
+
+    # Триггер на уровне оператора: одна пачка изменений — одно увеличение версии
+    op.execute("""
+        CREATE FUNCTION bump_data_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE entity = TG_ARGV[0];
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table in TRACKED_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table}_bump_data_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('{table}')
+        """)
+
+
+def downgrade() -> None:
+    for table in TRACKED_TABLES:
+        op.execute(f"DROP TRIGGER {table}_bump_data_version ON {table}")
+    op.execute("DROP FUNCTION bump_data_version()")
+    op.drop_table('data_versions')
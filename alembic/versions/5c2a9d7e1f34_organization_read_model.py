@@ -0,0 +1,63 @@
+"""Organization read model
+
+Revision ID: 5c2a9d7e1f34
+Revises: 8d41c6a2e5b7
+Create Date: 2026-10-19 12:41:05.336219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2a9d7e1f34'
+down_revision: Union[str, None] = '8d41c6a2e5b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Одна строка на организацию: всё, что нужно для ответа API, без соединений при чтении
+    op.execute("""
+        CREATE MATERIALIZED VIEW organization_read_model AS
+        SELECT
+            o.id,
+            o.name,
+            ARRAY(SELECT jsonb_array_elements_text(o.phone_numbers::jsonb)) AS phone_numbers,
+            o.building_id,
+            b.address,
+            b.latitude,
+            b.longitude,
+            COALESCE(links.activity_ids, '{}') AS activity_ids,
+            COALESCE(links.activity_names, '{}') AS activity_names
+        FROM organizations AS o
+        JOIN buildings AS b ON b.id = o.building_id
+        LEFT JOIN LATERAL (
+            SELECT
+                array_agg(a.id ORDER BY a.id) AS activity_ids,
+                array_agg(a.name ORDER BY a.id) AS activity_names
+            FROM organization_activities AS oa
+            JOIN activities AS a ON a.id = oa.activity_id
+            WHERE oa.organization_id = o.id
+        ) AS links ON true
+    """)
+    # Уникальный индекс нужен для REFRESH MATERIALIZED VIEW CONCURRENTLY
+    op.create_index('ix_organization_read_model_id', 'organization_read_model', ['id'], unique=True)
+    op.create_index('ix_organization_read_model_building_id', 'organization_read_model', ['building_id'])
+    op.create_index('ix_organization_read_model_activity_ids', 'organization_read_model', ['activity_ids'],
+                    postgresql_using='gin')
+    op.create_index('ix_organization_read_model_coordinates', 'organization_read_model',
+                    ['latitude', 'longitude'])
+    # Поиск по части названия (name ILIKE '%...%') — триграммный GIN-индекс
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_organization_read_model_name_trgm', 'organization_read_model', ['name'],
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    # Триггеры на REFRESH MATERIALIZED VIEW не срабатывают: версию модели чтения увеличивает сам пересчёт,
+    # иначе ETag не изменится вместе с содержимым ответа
+    op.execute("INSERT INTO data_versions (entity, version) VALUES ('organization_read_model', 0)")
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM data_versions WHERE entity = 'organization_read_model'")
+    op.execute("DROP MATERIALIZED VIEW organization_read_model")
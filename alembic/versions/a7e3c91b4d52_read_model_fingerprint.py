@@ -0,0 +1,69 @@
+"""Fingerprint column in organization read model
+
+Revision ID: a7e3c91b4d52
+Revises: 5c2a9d7e1f34
+Create Date: 2026-10-19 16:22:48.901337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e3c91b4d52'
+down_revision: Union[str, None] = '5c2a9d7e1f34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+READ_MODEL_ROWS = """
+    SELECT
+        o.id,
+        o.name,
+        ARRAY(SELECT jsonb_array_elements_text(o.phone_numbers::jsonb)) AS phone_numbers,
+        o.building_id,
+        b.address,
+        b.latitude,
+        b.longitude,
+        COALESCE(links.activity_ids, '{}') AS activity_ids,
+        COALESCE(links.activity_names, '{}') AS activity_names
+    FROM organizations AS o
+    JOIN buildings AS b ON b.id = o.building_id
+    LEFT JOIN LATERAL (
+        SELECT
+            array_agg(a.id ORDER BY a.id) AS activity_ids,
+            array_agg(a.name ORDER BY a.id) AS activity_names
+        FROM organization_activities AS oa
+        JOIN activities AS a ON a.id = oa.activity_id
+        WHERE oa.organization_id = o.id
+    ) AS links ON true
+"""
+
+
+def create_indexes() -> None:
+    op.create_index('ix_organization_read_model_id', 'organization_read_model', ['id'], unique=True)
+    op.create_index('ix_organization_read_model_building_id', 'organization_read_model', ['building_id'])
+    op.create_index('ix_organization_read_model_activity_ids', 'organization_read_model', ['activity_ids'],
+                    postgresql_using='gin')
+    op.create_index('ix_organization_read_model_coordinates', 'organization_read_model',
+                    ['latitude', 'longitude'])
+    op.create_index('ix_organization_read_model_name_trgm', 'organization_read_model', ['name'],
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def upgrade() -> None:
+    # fingerprint — хэш всего, что попадает в ответ API по организации (включая здание и виды деятельности).
+    # По нему кэш готовых JSON-фрагментов понимает, что фрагмент устарел
+    op.execute("DROP MATERIALIZED VIEW organization_read_model")
+    op.execute(f"""
+        CREATE MATERIALIZED VIEW organization_read_model AS
+        SELECT rows.*, md5(rows::text) AS fingerprint
+        FROM ({READ_MODEL_ROWS}) AS rows
+    """)
+    create_indexes()
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW organization_read_model")
+    op.execute(f"CREATE MATERIALIZED VIEW organization_read_model AS {READ_MODEL_ROWS}")
+    create_indexes()
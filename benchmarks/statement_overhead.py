@@ -0,0 +1,171 @@
+"""
+Замер накладных расходов Python на построение и компиляцию горячих запросов.
+
+Историческое сравнение: обе колонки описывают ORM-запросы, которые эндпоинты выполняли до модели
+чтения organization_read_model. «До» — db.query(...) собирается заново на каждый запрос,
+«после» — те же запросы собраны один раз при импорте и берутся из кэша компиляции SQLAlchemy.
+Сервис эти запросы больше не выполняет: сейчас эндпоинты читают модель чтения (queries.READ_MODEL_*)
+и кэш JSON-фрагментов (utils/fragments.py). Модель чтения — материализованное представление PostgreSQL
+с массивами, в SQLite её не воспроизвести, поэтому текущий путь этот скрипт не измеряет.
+База — SQLite в памяти с тестовыми данными, поэтому время выполнения самого SQL минимально
+и разница показывает именно накладные расходы Python.
+
+Запуск из корня проекта:
+    python benchmarks/statement_overhead.py [количество_повторов]
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import bindparam, create_engine, select  # noqa: E402
+from sqlalchemy.orm import Session, joinedload  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from database import Base  # noqa: E402
+from models import Organization, Activity, Building  # noqa: E402
+
+# Проверки видов деятельности в том виде, в каком они выполнялись в SQL до дерева в памяти
+ACTIVITY_ID = select(Activity.id).where(Activity.id == bindparam("activity_id"))
+CHILD_ACTIVITY_IDS = select(Activity.id).where(Activity.parent_id.in_(bindparam("parent_ids", expanding=True)))
+
+# Заранее собранные ORM-запросы (организация со зданием и видами деятельности) в том виде,
+# в каком эндпоинты выполняли их до модели чтения organization_read_model
+_organizations = select(Organization).options(
+    joinedload(Organization.activities),
+    joinedload(Organization.building),
+)
+ORGANIZATION_BY_ID = _organizations.where(Organization.id == bindparam("organization_id"))
+ORGANIZATIONS_BY_BUILDING = _organizations.where(Organization.building_id == bindparam("building_id"))
+ORGANIZATIONS_BY_ACTIVITY = _organizations.where(Organization.activities.any(Activity.id == bindparam("activity_id")))
+ORGANIZATIONS_BY_ACTIVITIES = _organizations.where(
+    Organization.activities.any(Activity.id.in_(bindparam("activity_ids", expanding=True)))
+)
+
+
+def load_test_data(db: Session):
+    with open("test_data.json", "r", encoding="utf-8") as file:
+        data = json.load(file)
+
+    activities = {a["id"]: Activity(id=a["id"], name=a["name"], parent_id=a["parent_id"]) for a in data["activities"]}
+    db.add_all(Building(**b) for b in data["buildings"])
+    db.add_all(activities.values())
+    for o in data["organizations"]:
+        db.add(Organization(
+            id=o["id"],
+            name=o["name"],
+            phone_numbers=json.dumps(o["phone_numbers"]),
+            building_id=o["building_id"],
+            activities=[activities[activity_id] for activity_id in o["activity_ids"]],
+        ))
+    db.commit()
+
+
+def legacy_by_id(db):
+    return (
+        db.query(Organization)
+        .options(joinedload(Organization.activities), joinedload(Organization.building))
+        .filter(Organization.id == 3)
+        .first()
+    )
+
+
+def cached_by_id(db):
+    return db.execute(ORGANIZATION_BY_ID, {"organization_id": 3}).unique().scalars().first()
+
+
+def legacy_by_building(db):
+    return (
+        db.query(Organization)
+        .options(joinedload(Organization.activities), joinedload(Organization.building))
+        .filter(Organization.building_id == 3)
+        .all()
+    )
+
+
+def cached_by_building(db):
+    return db.execute(ORGANIZATIONS_BY_BUILDING, {"building_id": 3}).unique().scalars().all()
+
+
+def legacy_by_activity(db):
+    db.query(Activity).filter(Activity.id == 5).first()
+    return (
+        db.query(Organization)
+        .join(Organization.activities)
+        .join(Organization.building)
+        .filter(Organization.activities.any(id=5))
+        .all()
+    )
+
+
+def cached_by_activity(db):
+    db.execute(ACTIVITY_ID, {"activity_id": 5}).scalar()
+    return db.execute(ORGANIZATIONS_BY_ACTIVITY, {"activity_id": 5}).unique().scalars().all()
+
+
+def legacy_hierarchy(db):
+    db.query(Activity).filter(Activity.id == 1).first()
+    activity_ids = {1}
+    parent_ids = {1}
+    for _ in range(3):
+        parent_ids = {a[0] for a in db.query(Activity.id).filter(Activity.parent_id.in_(parent_ids)).all()}
+        if not parent_ids:
+            break
+        activity_ids |= parent_ids
+    return (
+        db.query(Organization)
+        .join(Organization.activities)
+        .outerjoin(Organization.building)
+        .options(joinedload(Organization.activities), joinedload(Organization.building))
+        .filter(Organization.activities.any(Activity.id.in_(activity_ids)))
+        .all()
+    )
+
+
+def cached_hierarchy(db):
+    db.execute(ACTIVITY_ID, {"activity_id": 1}).scalar()
+    activity_ids = {1}
+    parent_ids = {1}
+    for _ in range(3):
+        parent_ids = set(db.execute(CHILD_ACTIVITY_IDS, {"parent_ids": list(parent_ids)}).scalars())
+        if not parent_ids:
+            break
+        activity_ids |= parent_ids
+    return db.execute(ORGANIZATIONS_BY_ACTIVITIES, {"activity_ids": list(activity_ids)}).unique().scalars().all()
+
+
+CASES = [
+    ("by_id", legacy_by_id, cached_by_id),
+    ("by_building", legacy_by_building, cached_by_building),
+    ("by_activity", legacy_by_activity, cached_by_activity),
+    ("by_activity_hierarchy", legacy_hierarchy, cached_hierarchy),
+]
+
+
+def main(number: int = 2000):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    # Материализованные представления в SQLite не создаются
+    Base.metadata.create_all(engine, tables=[t for t in Base.metadata.sorted_tables if not t.info.get("is_view")])
+    with Session(engine) as db:
+        load_test_data(db)
+
+    print(f"{'запрос':<24}{'до, мкс':>12}{'после, мкс':>14}{'выигрыш':>10}")
+    for name, legacy, cached in CASES:
+        timings = []
+        for func in (legacy, cached):
+            def run():
+                # Новая сессия на каждый вызов, как в get_db
+                with Session(engine) as db:
+                    func(db)
+
+            run()  # прогрев
+            timings.append(timeit.timeit(run, number=number) / number * 1_000_000)
+        before, after = timings
+        print(f"{name:<24}{before:>12.1f}{after:>14.1f}{before / after:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,146 @@
+"""
+Подготовка базы перед запуском приложения: миграции и загрузка тестовых данных.
+
+Запускается один раз отдельной задачей (сервис init в docker-compose), а не при каждом старте
+контейнера с приложением. Параллельные запуски сериализуются advisory-блокировкой PostgreSQL.
+Если схема уже на последней миграции, а тестовые данные с той же контрольной суммой уже загружены,
+задача завершается сразу, не разбирая JSON и не запуская Alembic.
+
+Использование:
+    python boot.py init            — миграции и тестовые данные (по необходимости)
+    python boot.py measure-import  — замер времени импорта main.py
+    python boot.py refresh-read-model — пересчёт модели чтения после правок справочника в обход API
+"""
+import hashlib
+import importlib
+import sys
+import time
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import SessionLocal, engine
+from logger.logging_config import setup_logging
+from logger.logging_templates import log_info, log_error
+from models import AppState
+from test_data import TEST_DATA_FILE, insert_test_data
+from utils.read_model import refresh_read_model
+
+# Ключ advisory-блокировки, под которой выполняется подготовка базы
+BOOT_LOCK_KEY = 4_717_001
+SEED_CHECKSUM_KEY = "seed_checksum"
+
+
+def seed_checksum() -> str:
+    # Хэшируем байты файла, не разбирая JSON
+    with open(TEST_DATA_FILE, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def schema_is_current(alembic_config: Config) -> bool:
+    head = ScriptDirectory.from_config(alembic_config).get_current_head()
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision() == head
+
+
+def seed_is_current(checksum: str) -> bool:
+    with SessionLocal() as db:
+        try:
+            state = db.get(AppState, SEED_CHECKSUM_KEY)
+        except SQLAlchemyError:
+            # Таблицы ещё нет — миграции не применялись
+            return False
+        return state is not None and state.value == checksum
+
+
+def record_seed(checksum: str):
+    with SessionLocal() as db:
+        db.merge(AppState(key=SEED_CHECKSUM_KEY, value=checksum))
+        db.commit()
+
+
+class Timer:
+    """Замер длительности этапов запуска"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages = {}
+
+    def stage(self, name: str, started_at: float):
+        self.stages[name] = time.perf_counter() - started_at
+
+    def report(self) -> str:
+        total = time.perf_counter() - self.started_at
+        stages = ", ".join(f"{name}: {seconds:.3f} с" for name, seconds in self.stages.items())
+        return f"всего {total:.3f} с ({stages})"
+
+
+def init() -> bool:
+    timer = Timer()
+    alembic_config = Config("alembic.ini")
+    checksum = seed_checksum()
+
+    started_at = time.perf_counter()
+    up_to_date = schema_is_current(alembic_config) and seed_is_current(checksum)
+    timer.stage("проверка версий", started_at)
+    if up_to_date:
+        log_info(action="Подготовка базы", message=f"Схема и данные актуальны, пропускаем: {timer.report()}")
+        return True
+
+    with engine.connect() as lock_connection:
+        started_at = time.perf_counter()
+        use_lock = lock_connection.dialect.name == "postgresql"
+        if use_lock:
+            # Блокировка уровня сессии: держится до явного снятия, транзакцию можно закрыть
+            lock_connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": BOOT_LOCK_KEY})
+            lock_connection.commit()
+        timer.stage("ожидание блокировки", started_at)
+
+        try:
+            # Пока ждали блокировку, другая задача могла всё сделать
+            started_at = time.perf_counter()
+            if not schema_is_current(alembic_config):
+                command.upgrade(alembic_config, "head")
+            timer.stage("миграции", started_at)
+
+            started_at = time.perf_counter()
+            if not seed_is_current(checksum):
+                if not insert_test_data():
+                    log_error(action="Подготовка базы", message="Не удалось загрузить тестовые данные")
+                    return False
+                record_seed(checksum)
+            timer.stage("тестовые данные", started_at)
+        finally:
+            if use_lock:
+                lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": BOOT_LOCK_KEY})
+                lock_connection.commit()
+
+    log_info(action="Подготовка базы", message=f"Готово: {timer.report()}")
+    return True
+
+
+def measure_import() -> float:
+    started_at = time.perf_counter()
+    importlib.import_module("main")
+    return time.perf_counter() - started_at
+
+
+if __name__ == "__main__":
+    setup_logging(True)
+    mode = sys.argv[1] if len(sys.argv) > 1 else "init"
+    if mode == "init":
+        sys.exit(0 if init() else 1)
+    elif mode == "measure-import":
+        print(f"Импорт main.py: {measure_import():.3f} с")
+    elif mode == "refresh-read-model":
+        with SessionLocal() as db:
+            refresh_read_model(db)
+            db.commit()
+        log_info(action="Модель чтения", message="Модель чтения пересчитана")
+    else:
+        print(__doc__)
+        sys.exit(2)
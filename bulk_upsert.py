@@ -0,0 +1,33 @@
+"""
+Пакетная запись справочника из JSON-файла в формате test_data.json.
+
+Использование:
+    python bulk_upsert.py delta.json
+"""
+import json
+import sys
+
+from database import SessionLocal
+from schemas import BulkUpsertSchema
+from utils.bulk_upsert import apply_bulk_upsert
+
+
+def main(path: str):
+    with open(path, "r", encoding="utf-8") as file:
+        batch = BulkUpsertSchema.model_validate(json.load(file))
+
+    with SessionLocal() as db:
+        result = apply_bulk_upsert(db, batch)
+
+    print(
+        f"✅ Здания: {result.buildings}, виды деятельности: {result.activities}, организации: {result.organizations}, "
+        f"связей добавлено: {result.links_added}, удалено: {result.links_removed}"
+    )
+    print(f"ℹ️ {result.seconds} с, {result.records_per_second} записей/с")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(2)
+    main(sys.argv[1])
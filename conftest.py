@@ -0,0 +1,2 @@
+# test_data.py — скрипт загрузки тестовых данных, а не модуль с тестами
+collect_ignore = ["test_data.py"]
@@ -1,23 +1,171 @@
+import itertools
 import os
+import threading
+import time
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+
+from logger.logging_templates import log_warning
+from utils.deadline import apply_statement_timeout
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Реплики только для чтения, через запятую. Если не указаны — всё идёт в основную БД
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Стратегия балансировки между репликами: round_robin или least_connections
+REPLICA_BALANCING = os.getenv("REPLICA_BALANCING", "round_robin")
+# На сколько секунд исключаем реплику после ошибки соединения
+REPLICA_EJECT_SECONDS = float(os.getenv("REPLICA_EJECT_SECONDS", "30"))
+# Максимально допустимое отставание реплики в секундах (не задано — не проверяем)
+REPLICA_MAX_LAG_SECONDS = os.getenv("REPLICA_MAX_LAG_SECONDS")
+# Как часто перепроверять отставание реплики, в секундах
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "5"))
+
+# Отставание реплики: 0, если всё полученное WAL уже применено
+REPLICATION_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
 
 engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+class Replica:
+    """Реплика для чтения: свой движок, счётчик активных соединений и состояние здоровья."""
+
+    def __init__(self, url: str):
+        self.engine = create_engine(url, pool_pre_ping=True)
+        self.name = self.engine.url.render_as_string(hide_password=True)
+        self.active_connections = 0
+        self.ejected_until = 0.0
+        self.lag_checked_at = 0.0
+
+        # Обрыв соединения посреди запроса тоже выводит реплику из ротации
+        event.listen(self.engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        if context.is_disconnect:
+            self.eject("Соединение с репликой разорвано", REPLICA_EJECT_SECONDS)
+
+    def eject(self, reason: str, seconds: float):
+        self.ejected_until = time.monotonic() + seconds
+        log_warning(
+            action="Балансировка чтения по репликам",
+            message=f"Реплика {self.name} исключена на {seconds} с: {reason}"
+        )
+
+    def connect(self):
+        connection = self.engine.connect()
+        if REPLICA_MAX_LAG_SECONDS is None or connection.dialect.name != "postgresql":
+            return connection
+
+        now = time.monotonic()
+        if now - self.lag_checked_at < REPLICA_LAG_CHECK_INTERVAL:
+            return connection
+
+        self.lag_checked_at = now
+        lag = connection.execute(REPLICATION_LAG_QUERY).scalar() or 0
+        connection.rollback()
+        if lag > float(REPLICA_MAX_LAG_SECONDS):
+            connection.close()
+            self.eject(f"отставание {lag:.1f} с", REPLICA_LAG_CHECK_INTERVAL)
+            return None
+        return connection
+
+
+class ReplicaPool:
+    """Набор реплик с балансировкой round robin / least connections."""
+
+    def __init__(self, urls, strategy: str):
+        self.replicas = [Replica(url) for url in urls]
+        self.strategy = strategy
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def _candidates(self):
+        now = time.monotonic()
+        available = [replica for replica in self.replicas if replica.ejected_until <= now]
+        if not available:
+            return []
+        if self.strategy == "least_connections":
+            return sorted(available, key=lambda replica: replica.active_connections)
+        start = next(self._counter) % len(available)
+        return available[start:] + available[:start]
+
+    def acquire(self):
+        """
+        Возвращает (реплика, соединение) или (None, None), если здоровых реплик нет.
+        """
+        for replica in self._candidates():
+            try:
+                connection = replica.connect()
+            except DBAPIError as e:
+                replica.eject(f"ошибка соединения: {e.orig}", REPLICA_EJECT_SECONDS)
+                continue
+            if connection is None:
+                continue
+            with self._lock:
+                replica.active_connections += 1
+            return replica, connection
+        return None, None
+
+    def release(self, replica: Replica):
+        with self._lock:
+            replica.active_connections -= 1
+
+
+replica_pool = ReplicaPool(DATABASE_REPLICA_URLS, REPLICA_BALANCING)
+
+
+class RoutingSession(Session):
+    """
+    Сессия, которая отправляет чтение (GET-запросы) на реплики, а всё остальное — в основную БД.
+    Если ни одна реплика недоступна, чтение также уходит в основную БД.
+    """
+
+    _replica = None
+    _replica_connection = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if not self.info.get("read_only") or self._flushing or not replica_pool.replicas:
+            return engine
+        if self._replica_connection is None:
+            self._replica, self._replica_connection = replica_pool.acquire()
+        return self._replica_connection or engine
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            if self._replica_connection is not None:
+                self._replica_connection.close()
+                replica_pool.release(self._replica)
+                self._replica, self._replica_connection = None, None
+
+
+# Транзакции запросов с дедлайном ограничиваются через SET LOCAL statement_timeout
+event.listen(RoutingSession, "after_begin", apply_statement_timeout)
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
 # Функция для получения сессии БД
-def get_db():
+def get_db(request: Request):
     db = SessionLocal()
+    # Запросы на чтение можно обслуживать с реплик
+    db.info["read_only"] = request.method in ("GET", "HEAD")
+    deadline = getattr(request.state, "deadline", None)
+    db.info["deadline"] = deadline
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        if deadline is not None:
+            deadline.release()
+        db.close()
@@ -0,0 +1,194 @@
+"""
+Выгрузка справочника для аналитики: организации вместе со зданиями и ID видов деятельности.
+
+Строки читаются курсором на стороне сервера порциями по --chunk-size, поэтому память не растёт
+с размером справочника. Чтение идёт с реплик, если они настроены.
+
+Форматы: parquet и arrow (Arrow IPC) — нужен pyarrow; csv — без дополнительных зависимостей.
+При --partition-by-region файлы раскладываются по каталогам region=<город> (Hive-разметка).
+
+Использование:
+    python export_snapshot.py [--format parquet|arrow|csv] [--output export] [--chunk-size 10000]
+                              [--partition-by-region]
+"""
+import argparse
+import csv
+import json
+import os
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from database import SessionLocal
+from models import Organization, Building, organization_activity_association
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pyarrow нужен только для parquet и arrow
+    pyarrow = None
+
+_links = (
+    select(
+        organization_activity_association.c.organization_id,
+        func.array_agg(
+            aggregate_order_by(
+                organization_activity_association.c.activity_id,
+                organization_activity_association.c.activity_id,
+            )
+        ).label("activity_ids"),
+    )
+    .group_by(organization_activity_association.c.organization_id)
+    .subquery()
+)
+
+EXPORT_ROWS = (
+    select(
+        Organization.id,
+        Organization.name,
+        Organization.phone_numbers,
+        Organization.building_id,
+        Building.address,
+        Building.latitude,
+        Building.longitude,
+        _links.c.activity_ids,
+    )
+    .outerjoin(Building, Organization.building_id == Building.id)
+    .outerjoin(_links, _links.c.organization_id == Organization.id)
+    .order_by(Organization.id)
+)
+
+COLUMNS = ["id", "name", "phone_numbers", "building_id", "address", "latitude", "longitude", "activity_ids"]
+
+
+def region_of(address) -> str:
+    # Регион — город, первая часть адреса до запятой
+    region = (address or "").split(",", 1)[0].strip() or "unknown"
+    return region.replace("/", "_")
+
+
+def to_columns(rows) -> dict:
+    columns = {name: [] for name in COLUMNS}
+    for row in rows:
+        columns["id"].append(row.id)
+        columns["name"].append(row.name)
+        columns["phone_numbers"].append(json.loads(row.phone_numbers) if row.phone_numbers else [])
+        columns["building_id"].append(row.building_id)
+        columns["address"].append(row.address)
+        columns["latitude"].append(row.latitude)
+        columns["longitude"].append(row.longitude)
+        columns["activity_ids"].append(row.activity_ids or [])
+    return columns
+
+
+class ArrowWriter:
+    """Запись порций в Parquet или Arrow IPC"""
+
+    def __init__(self, path: str, file_format: str):
+        self.schema = pyarrow.schema([
+            ("id", pyarrow.int64()),
+            ("name", pyarrow.string()),
+            ("phone_numbers", pyarrow.list_(pyarrow.string())),
+            ("building_id", pyarrow.int64()),
+            ("address", pyarrow.string()),
+            ("latitude", pyarrow.float64()),
+            ("longitude", pyarrow.float64()),
+            ("activity_ids", pyarrow.list_(pyarrow.int32())),
+        ])
+        if file_format == "parquet":
+            self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            self.writer = pyarrow.ipc.new_file(path, self.schema)
+
+    def write(self, rows):
+        self.writer.write_table(pyarrow.Table.from_pydict(to_columns(rows), schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class CsvWriter:
+    """Компактный CSV: списки записываются через точку с запятой"""
+
+    def __init__(self, path: str, file_format: str):
+        self.file = open(path, "w", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(
+            (
+                row.id,
+                row.name,
+                ";".join(json.loads(row.phone_numbers)) if row.phone_numbers else "",
+                row.building_id,
+                row.address,
+                row.latitude,
+                row.longitude,
+                ";".join(map(str, row.activity_ids or [])),
+            )
+            for row in rows
+        )
+
+    def close(self):
+        self.file.close()
+
+
+WRITERS = {"parquet": ArrowWriter, "arrow": ArrowWriter, "csv": CsvWriter}
+EXTENSIONS = {"parquet": "parquet", "arrow": "arrow", "csv": "csv"}
+
+
+def export(output: str, file_format: str = "parquet", chunk_size: int = 10_000,
+           partition_by_region: bool = False) -> int:
+    if file_format != "csv" and pyarrow is None:
+        raise RuntimeError("Для форматов parquet и arrow нужен пакет pyarrow")
+
+    writer_class = WRITERS[file_format]
+    file_name = f"organizations.{EXTENSIONS[file_format]}"
+    writers = {}
+
+    def writer_for(region):
+        if region not in writers:
+            directory = os.path.join(output, f"region={region}") if partition_by_region else output
+            os.makedirs(directory, exist_ok=True)
+            writers[region] = writer_class(os.path.join(directory, file_name), file_format)
+        return writers[region]
+
+    exported = 0
+    db = SessionLocal()
+    # Только чтение — выгрузку можно делать с реплики
+    db.info["read_only"] = True
+    try:
+        # yield_per включает курсор на стороне сервера и отдаёт строки порциями
+        result = db.execute(EXPORT_ROWS, execution_options={"yield_per": chunk_size})
+        for rows in result.partitions():
+            if partition_by_region:
+                by_region = {}
+                for row in rows:
+                    by_region.setdefault(region_of(row.address), []).append(row)
+                for region, region_rows in by_region.items():
+                    writer_for(region).write(region_rows)
+            else:
+                writer_for(None).write(rows)
+            exported += len(rows)
+    finally:
+        db.close()
+        for writer in writers.values():
+            writer.close()
+    return exported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Выгрузка справочника организаций в колоночный формат")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="parquet")
+    parser.add_argument("--output", default="export")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--partition-by-region", action="store_true")
+    args = parser.parse_args()
+
+    started_at = time.perf_counter()
+    count = export(args.output, args.format, args.chunk_size, args.partition_by_region)
+    seconds = time.perf_counter() - started_at
+    print(f"✅ Выгружено организаций: {count} за {seconds:.2f} с в {args.output}")
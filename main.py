@@ -1,10 +1,56 @@
-from fastapi import FastAPI
+import time
 
-from logger.logging_config import setup_logging
-from routers import organizations_router
+# Момент начала импорта: по нему считаем время импорта и полного запуска сервиса
+IMPORT_STARTED_AT = time.perf_counter()
 
-app = FastAPI()
+import asyncio  # noqa: E402
+from contextlib import asynccontextmanager  # noqa: E402
+
+from fastapi import FastAPI  # noqa: E402
+
+from logger.logging_config import setup_logging  # noqa: E402
+from logger.logging_templates import log_info  # noqa: E402
+from routers import bulk_router, facets_router, organizations_router, service_router  # noqa: E402
+from utils.admission import AdmissionMiddleware  # noqa: E402
+from utils.compression import CompressionMiddleware  # noqa: E402
+from utils.deadline import DeadlineExceeded, DeadlineMiddleware, deadline_exceeded_handler  # noqa: E402
+from utils.profiler import ProfilingMiddleware, profiling_enabled  # noqa: E402
+from utils.warmup import run_warmup, warmup_state  # noqa: E402
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Прогрев идёт в фоне: /health/live отвечает сразу, а /health/ready — только после прогрева
+    warmup = asyncio.create_task(asyncio.to_thread(run_warmup))
+
+    log_info(
+        action="Запуск сервиса",
+        message=f"Импорт main.py: {IMPORT_SECONDS:.3f} с, запуск целиком: {time.perf_counter() - IMPORT_STARTED_AT:.3f} с"
+    )
+    yield
+    warmup_state.stopped.set()
+    await warmup
+
+
+app = FastAPI(lifespan=lifespan)
 
 setup_logging(True)
 
+# Профилировщик подключается только если включён, иначе не стоит ничего.
+# Он самый внутренний: в профиль попадают обработчик и сериализация ответа
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(CompressionMiddleware)
+# Чем позже добавлен middleware, тем он внешний: лишние запросы сбрасываются до любой работы
+app.add_middleware(AdmissionMiddleware)
+# Дедлайн считается с момента прихода запроса, включая ожидание в очереди
+app.add_middleware(DeadlineMiddleware)
+
+app.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)
+
 app.include_router(organizations_router, prefix="/api", tags=["Organizations"])
+app.include_router(facets_router, prefix="/api", tags=["Facets"])
+app.include_router(bulk_router, prefix="/api", tags=["Bulk"])
+app.include_router(service_router, tags=["Service"])
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED_AT
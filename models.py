@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table
+from sqlalchemy import BigInteger, Column, Integer, String, Float, ForeignKey, Table
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 
 from database import Base
@@ -45,3 +46,43 @@ class Activity(Base):
     parent = relationship("Activity", remote_side="Activity.id")  # Связь на саму себя
     organizations = relationship("Organization", secondary=organization_activity_association,
                                  back_populates="activities")
+
+
+class DataVersion(Base):
+    """
+    Версия данных по каждой таблице справочника.
+    Увеличивается триггерами на каждое изменение таблицы, по ней кэши понимают, что пора обновиться.
+    """
+    __tablename__ = "data_versions"
+
+    entity = Column(String, primary_key=True)  # Название таблицы
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+class AppState(Base):
+    """
+    Служебные отметки приложения (например, контрольная сумма загруженных тестовых данных).
+    """
+    __tablename__ = "app_state"
+
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
+
+
+# Модель чтения: материализованное представление с одной строкой на организацию (см. миграции 5c2a9d7e1f34 и a7e3c91b4d52).
+# Описана как таблица только для запросов, Alembic её не создаёт и не сравнивает (info["is_view"])
+organization_read_model = Table(
+    "organization_read_model",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String),
+    Column("phone_numbers", ARRAY(String)),
+    Column("building_id", Integer),
+    Column("address", String),
+    Column("latitude", Float),
+    Column("longitude", Float),
+    Column("activity_ids", ARRAY(Integer)),
+    Column("activity_names", ARRAY(String)),
+    Column("fingerprint", String),  # Хэш строки: меняется вместе с любыми данными организации в ответе
+    info={"is_view": True},
+)
@@ -0,0 +1,88 @@
+"""
+Заранее собранные запросы для горячих эндпоинтов.
+
+Запросы строятся один раз при импорте модуля, а параметры передаются через bindparam.
+Поэтому ключ кэша у каждого запроса постоянный, и SQLAlchemy берёт уже скомпилированный SQL
+из кэша компиляции вместо того, чтобы собирать и компилировать запрос на каждый HTTP-запрос.
+"""
+import functools
+
+from sqlalchemy import Integer, bindparam, distinct, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, array
+
+from models import Activity, organization_read_model
+
+# Модель чтения: одна строка на организацию, каждый список — выборка из одной таблицы по индексу.
+# Списки выбирают только id и fingerprint: сами организации берутся из кэша JSON-фрагментов (utils/fragments.py)
+_read_model_ids = select(organization_read_model.c.id, organization_read_model.c.fingerprint).order_by(
+    organization_read_model.c.id
+)
+
+READ_MODEL_BY_ID = _read_model_ids.where(organization_read_model.c.id == bindparam("organization_id"))
+
+READ_MODEL_BY_BUILDING = _read_model_ids.where(organization_read_model.c.building_id == bindparam("building_id"))
+
+READ_MODEL_BY_BUILDINGS = _read_model_ids.where(
+    organization_read_model.c.building_id.in_(bindparam("building_ids", expanding=True))
+)
+
+# activity_ids @> ARRAY[:activity_id] и activity_ids && :activity_ids используют GIN-индекс
+READ_MODEL_BY_ACTIVITY = _read_model_ids.where(
+    organization_read_model.c.activity_ids.contains(array([bindparam("activity_id", type_=Integer)]))
+)
+
+READ_MODEL_BY_ACTIVITIES = _read_model_ids.where(
+    organization_read_model.c.activity_ids.overlap(bindparam("activity_ids", type_=ARRAY(Integer)))
+)
+
+READ_MODEL_BY_NAME = _read_model_ids.where(organization_read_model.c.name.ilike(bindparam("pattern")))
+
+# Координаты здания лежат в самой модели чтения, поэтому прямоугольник — один запрос по индексу координат
+READ_MODEL_IN_RECTANGLE = _read_model_ids.where(
+    organization_read_model.c.latitude.between(bindparam("min_lat"), bindparam("max_lat")),
+    organization_read_model.c.longitude.between(bindparam("min_lon"), bindparam("max_lon")),
+)
+
+# Полные строки для организаций, которых нет в кэше фрагментов
+READ_MODEL_ROWS_BY_IDS = select(organization_read_model).where(
+    organization_read_model.c.id.in_(bindparam("organization_ids", expanding=True))
+)
+
+
+@functools.lru_cache(maxsize=None)
+def activity_counts(rollup: bool, by_building: bool, by_buildings: bool, in_rectangle: bool, by_name: bool):
+    """
+    Количество организаций по видам деятельности одним агрегирующим запросом по модели чтения.
+    Запрос собирается один раз на каждый набор фильтров, дальше берётся из кэша.
+    При rollup организация засчитывается и всем предкам своих видов деятельности (один раз на предка).
+    """
+    read_model = organization_read_model.c
+    conditions = []
+    if by_building:
+        conditions.append(read_model.building_id == bindparam("building_id"))
+    if by_buildings:
+        conditions.append(read_model.building_id.in_(bindparam("building_ids", expanding=True)))
+    if in_rectangle:
+        conditions.append(read_model.latitude.between(bindparam("min_lat"), bindparam("max_lat")))
+        conditions.append(read_model.longitude.between(bindparam("min_lon"), bindparam("max_lon")))
+    if by_name:
+        conditions.append(read_model.name.ilike(bindparam("pattern")))
+
+    links = (
+        select(read_model.id.label("organization_id"), func.unnest(read_model.activity_ids).label("activity_id"))
+        .where(*conditions)
+        .subquery("links")
+    )
+    if not rollup:
+        return select(links.c.activity_id, func.count().label("count")).group_by(links.c.activity_id)
+
+    # Замыкание дерева: пары (предок, вид деятельности), включая сам вид. UNION защищает от циклов
+    closure = select(Activity.id.label("ancestor_id"), Activity.id.label("activity_id")).cte("closure", recursive=True)
+    closure = closure.union(
+        select(closure.c.ancestor_id, Activity.id).where(Activity.parent_id == closure.c.activity_id)
+    )
+    return (
+        select(closure.c.ancestor_id.label("activity_id"), func.count(distinct(links.c.organization_id)).label("count"))
+        .join_from(links, closure, closure.c.activity_id == links.c.activity_id)
+        .group_by(closure.c.ancestor_id)
+    )
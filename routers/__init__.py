@@ -1,6 +1,9 @@
 from fastapi import APIRouter
 
+from .bulk import router as bulk_router
+from .facets import router as facets_router
 from .organizations import router as organizations_router
+from .service import router as service_router
 
 router = APIRouter()
 
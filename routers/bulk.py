@@ -0,0 +1,85 @@
+import os
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, status
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from database import get_db
+from logger.logging_templates import log_info, log_warning, log_error
+from schemas import BulkUpsertSchema, BulkUpsertResultSchema
+from utils.bulk_upsert import apply_bulk_upsert
+from utils.responses import BaseResponse, error_response, success_response
+
+# Ключ для записи через API. Если не задан, запись через API отключена (остаётся CLI bulk_upsert.py)
+BULK_API_KEY = os.getenv("BULK_API_KEY")
+
+# Код ошибки PostgreSQL foreign_key_violation: ссылка на несуществующее здание, вид деятельности или родителя
+FOREIGN_KEY_VIOLATION = "23503"
+
+router = APIRouter()
+
+
+def require_api_key(x_api_key: Optional[str] = Header(default=None)):
+    if not BULK_API_KEY:
+        error_response(
+            message="Запись через API отключена",
+            status_code=status.HTTP_403_FORBIDDEN
+        )
+    # Сравниваем байты: compare_digest не принимает строки с не-ASCII символами.
+    # Starlette декодирует заголовки как latin-1, так что encode возвращает исходные байты
+    if x_api_key is None or not secrets.compare_digest(x_api_key.encode("latin-1"), BULK_API_KEY.encode("utf-8")):
+        log_warning(
+            action="Пакетная запись справочника",
+            message="Передан неверный API-ключ"
+        )
+        error_response(
+            message="Неверный API-ключ",
+            status_code=status.HTTP_401_UNAUTHORIZED
+        )
+
+
+@router.post(
+    "/bulk/upsert",
+    status_code=status.HTTP_200_OK,
+    response_model=BaseResponse[BulkUpsertResultSchema],
+    dependencies=[Depends(require_api_key)]
+)
+def bulk_upsert(batch: BulkUpsertSchema, db: Session = Depends(get_db)):
+    """
+    Пакетное добавление и обновление зданий, видов деятельности и организаций (со связями)
+    """
+    log_info(
+        action="Пакетная запись справочника",
+        message=f"Получено зданий: {len(batch.buildings)}, видов деятельности: {len(batch.activities)}, "
+                f"организаций: {len(batch.organizations)}"
+    )
+    try:
+        result = apply_bulk_upsert(db, batch)
+        return success_response(
+            message="Данные успешно записаны",
+            data=result
+        )
+    except IntegrityError as e:
+        # Ошибка в самих данных пакета, а не на сервере: сообщаем клиенту, какое ограничение нарушено
+        constraint = getattr(getattr(e.orig, "diag", None), "constraint_name", None)
+        foreign_key = getattr(e.orig, "pgcode", None) == FOREIGN_KEY_VIOLATION
+        log_warning(
+            action="Пакетная запись справочника",
+            message=f"Пакет нарушает ограничение {constraint}: {str(e.orig)}"
+        )
+        return error_response(
+            message="Пакет ссылается на несуществующие записи" if foreign_key else "Пакет конфликтует с данными справочника",
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY if foreign_key else status.HTTP_409_CONFLICT,
+            data={"constraint": constraint}
+        )
+    except SQLAlchemyError as e:
+        log_error(
+            action="Пакетная запись справочника",
+            message=f"Ошибка SQLAlchemy: {str(e)}"
+        )
+        return error_response(
+            message="Ошибка сервера при записи данных",
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
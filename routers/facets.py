@@ -0,0 +1,134 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+import queries
+from database import get_db
+from logger.logging_templates import log_info, log_error
+from schemas import ActivityFacetSchema
+from utils.activity_tree import activity_tree
+from utils.calculating import buildings_within_radius
+from utils.conditional import conditional_get
+from utils.deadline import deadline_of
+from utils.responses import BaseResponse, error_response, success_response
+from utils.single_flight import single_flight
+from utils.snapshot import dataset_snapshot
+
+router = APIRouter(dependencies=[Depends(conditional_get)])
+
+
+@router.get(
+    "/facets/activities",
+    status_code=status.HTTP_200_OK,
+    response_model=BaseResponse[List[ActivityFacetSchema]]
+)
+@single_flight
+def get_activity_facets(
+        building_id: Optional[int] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
+        radius_km: Optional[float] = None,
+        min_lat: Optional[float] = None,
+        max_lat: Optional[float] = None,
+        min_lon: Optional[float] = None,
+        max_lon: Optional[float] = None,
+        name: Optional[str] = None,
+        rollup: bool = False,
+        db: Session = Depends(get_db)
+):
+    """
+    Количество организаций по видам деятельности с фильтрами по зданию, области
+    (радиус от lat/lon или прямоугольник) и части названия. Фильтры можно сочетать.
+    При rollup=true организации засчитываются и родительским видам деятельности.
+    Считается одним SQL-запросом, сами организации не загружаются.
+    """
+
+    log_info(
+        action="Количество организаций по видам деятельности",
+        message=f"building_id: {building_id}, radius_km: {radius_km}, name: {name}, rollup: {rollup}"
+    )
+
+    rectangle = [min_lat, max_lat, min_lon, max_lon]
+    if radius_km is not None:
+        if lat is None or lon is None:
+            return error_response(
+                message="Для фильтра по радиусу необходимо указать lat и lon",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        if any(value is not None for value in rectangle):
+            return error_response(
+                message="Нельзя одновременно указывать radius_km и границы прямоугольника",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+    elif lat is not None or lon is not None:
+        return error_response(
+            message="lat и lon используются только вместе с radius_km",
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
+    in_rectangle = all(value is not None for value in rectangle)
+    if not in_rectangle and any(value is not None for value in rectangle):
+        return error_response(
+            message="Для фильтра по прямоугольнику необходимо указать min_lat, max_lat, min_lon, max_lon",
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        params = {}
+        if building_id is not None:
+            params["building_id"] = building_id
+        if radius_km is not None:
+            params["building_ids"] = buildings_within_radius(
+                dataset_snapshot.get(db), deadline_of(db), lat, lon, radius_km
+            )
+            if not params["building_ids"]:
+                return success_response(message="Данные успешно получены", data=[])
+        if in_rectangle:
+            params.update(min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon)
+        if name:
+            params["pattern"] = f"%{name}%"
+
+        statement = queries.activity_counts(
+            rollup=rollup,
+            by_building=building_id is not None,
+            by_buildings=radius_km is not None,
+            in_rectangle=in_rectangle,
+            by_name=bool(name),
+        )
+        counts = db.execute(statement, params).all()
+
+        # Названия и родителей берём из дерева в памяти, а не соединением в SQL
+        tree = activity_tree.get(db)
+        result = [
+            ActivityFacetSchema(
+                id=row.activity_id,
+                name=tree.names.get(row.activity_id, ""),
+                parent_id=tree.parents.get(row.activity_id),
+                count=row.count,
+            )
+            for row in counts
+        ]
+        result.sort(key=lambda facet: (-facet.count, facet.name))
+
+        log_info(
+            action="Количество организаций по видам деятельности",
+            message=f"Найдено {len(result)} видов деятельности"
+        )
+
+        # Пустой список — тоже ответ: под фильтрами просто нет организаций
+        return success_response(
+            message="Данные успешно получены",
+            data=result
+        )
+
+    except SQLAlchemyError as e:
+        db.rollback()
+        log_error(
+            action="Количество организаций по видам деятельности",
+            message=f"Ошибка SQLAlchemy: {str(e)}"
+        )
+        return error_response(
+            message="Ошибка сервера при обработке запроса",
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
@@ -1,18 +1,25 @@
-import json
 from typing import List, Optional, Literal
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Response, status
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 
+import queries
 from database import get_db
-from logger.logging_templates import log_info, log_warning, log_error
-from models import Organization, Activity, Building
-from schemas import OrganizationRequestSchema
-from utils.calculating import haversine_distance
+from logger.logging_templates import log_debug, log_info, log_warning, log_error
+from schemas import OrganizationRequestSchema, OrganizationSuggestionSchema
+from utils.activity_tree import ACTIVITY_HIERARCHY_DEPTH, activity_tree
+from utils.autocomplete import AUTOCOMPLETE_TOP_K, autocomplete
+from utils.calculating import buildings_within_radius
+from utils.conditional import conditional_get
+from utils.deadline import deadline_of
+from utils.fragments import fragment_cache, fragments_response, join_fragments
 from utils.responses import BaseResponse, error_response, success_response
+from utils.single_flight import single_flight
+from utils.snapshot import dataset_snapshot
 
-router = APIRouter()
+# Все эндпоинты только читают данные, поэтому ко всем применяется проверка ETag / If-None-Match
+router = APIRouter(dependencies=[Depends(conditional_get)])
 
 
 @router.get(
@@ -20,7 +27,8 @@ router = APIRouter()
     status_code=status.HTTP_200_OK,
     response_model=BaseResponse[List[OrganizationRequestSchema]]
 )
-async def get_by_building(building_id: int, db: Session = Depends(get_db)):
+@single_flight
+def get_by_building(building_id: int, response: Response, db: Session = Depends(get_db)):
     """
     Поиск организаций в здании
     """
@@ -30,12 +38,7 @@ async def get_by_building(building_id: int, db: Session = Depends(get_db)):
     )
     try:
         organizations = (
-            db.query(Organization)
-            .options(
-                joinedload(Organization.activities),  # Подгружаем связанные виды деятельности
-                joinedload(Organization.building)  # Подгружаем информацию о здании
-            )
-            .filter(Organization.building_id == building_id)
+            db.execute(queries.READ_MODEL_BY_BUILDING, {"building_id": building_id})
             .all()
         )
         if not organizations:
@@ -49,29 +52,18 @@ async def get_by_building(building_id: int, db: Session = Depends(get_db)):
                 status_code=status.HTTP_404_NOT_FOUND
             )
 
-        # Переделываем ответ в Pydantic
-        result = [
-            OrganizationRequestSchema(
-                id=org.id,
-                name=org.name,
-                phone_numbers=json.loads(org.phone_numbers),
-                activities=[activity.name for activity in org.activities],
-                address=org.building.address,
-                latitude=org.building.latitude,
-                longitude=org.building.longitude
-
-            )
-            for org in organizations
-        ]
+        # Готовый JSON организаций из кэша фрагментов, заново сериализуются только изменившиеся
+        fragments = fragment_cache.get_many(db, organizations)
 
         log_info(
             action="Запрос организаций расположенных в указанном здании",
-            message=f"Найдено {len(result)} значений"
+            message=f"Найдено {len(fragments)} значений"
         )
 
-        return success_response(
+        return fragments_response(
             message="Данные успешно получены",
-            data=result
+            data=join_fragments(fragments),
+            response=response
         )
     except SQLAlchemyError as e:
         log_error(
@@ -87,7 +79,8 @@ async def get_by_building(building_id: int, db: Session = Depends(get_db)):
 
 @router.get("/by_activity/{activity_id}", status_code=status.HTTP_200_OK,
             response_model=BaseResponse[List[OrganizationRequestSchema]])
-async def get_by_activity(activity_id: int, db: Session = Depends(get_db)):
+@single_flight
+def get_by_activity(activity_id: int, response: Response, db: Session = Depends(get_db)):
     """
     Поиск организаций по виду деятельности
     """
@@ -96,8 +89,8 @@ async def get_by_activity(activity_id: int, db: Session = Depends(get_db)):
         message=f"Запросили организации с видом деятельности с id {activity_id}"
     )
     try:
-        activity = db.query(Activity).filter(Activity.id == activity_id).first()
-        if not activity:
+        # Проверка по дереву видов деятельности в памяти, без SQL
+        if not activity_tree.get(db).exists(activity_id):
             log_warning(
                 action="Запрос организаций занимающиеся указанным видом деятельности",
                 message=f"Деятельности с данным ID {activity_id} не найдена"
@@ -109,10 +102,7 @@ async def get_by_activity(activity_id: int, db: Session = Depends(get_db)):
             )
 
         organizations = (
-            db.query(Organization)
-            .join(Organization.activities)  # Подключаем связь многие-ко-многим
-            .join(Organization.building)  # Подключаем здание
-            .filter(Organization.activities.any(id=activity_id))  # Фильтруем по указанному activity_id
+            db.execute(queries.READ_MODEL_BY_ACTIVITY, {"activity_id": activity_id})
             .all()
         )
 
@@ -127,28 +117,17 @@ async def get_by_activity(activity_id: int, db: Session = Depends(get_db)):
                 status_code=status.HTTP_404_NOT_FOUND
             )
 
-        result = [
-            OrganizationRequestSchema(
-                id=org.id,
-                name=org.name,
-                phone_numbers=json.loads(org.phone_numbers),
-                activities=[activity.name for activity in org.activities],
-                address=org.building.address,
-                latitude=org.building.latitude,
-                longitude=org.building.longitude
-
-            )
-            for org in organizations
-        ]
+        fragments = fragment_cache.get_many(db, organizations)
 
         log_info(
             action="Запрос организаций занимающиеся указанным видом деятельности",
-            message=f"Найдено {len(result)} значений"
+            message=f"Найдено {len(fragments)} значений"
         )
 
-        return success_response(
+        return fragments_response(
             message="Данные успешно получены",
-            data=result
+            data=join_fragments(fragments),
+            response=response
         )
 
     except SQLAlchemyError as e:
@@ -166,10 +145,12 @@ async def get_by_activity(activity_id: int, db: Session = Depends(get_db)):
 @router.get("/by_location",
             status_code=status.HTTP_200_OK,
             response_model=BaseResponse[List[OrganizationRequestSchema]])
-async def get_by_location(
+@single_flight
+def get_by_location(
         search_type: Literal["radius", "rectangle"],
         lat: float,
         lon: float,
+        response: Response,
         radius_km: Optional[float] = None,
         min_lat: Optional[float] = None,
         max_lat: Optional[float] = None,
@@ -213,26 +194,34 @@ async def get_by_location(
             )
 
     try:
-        buildings_query = db.query(Building)
-
         if search_type == "radius":
-            # Загружаем все здания и фильтруем по расстоянию
-            buildings = buildings_query.all()
-            buildings_in_radius = [
-                b for b in buildings if haversine_distance(
-                    lat, lon,
-                    b.latitude, b.longitude
-                ) <= radius_km
-            ]
-            building_ids = [b.id for b in buildings_in_radius]
+            # Координаты зданий берём из общего снимка (mmap) и фильтруем по расстоянию
+            building_ids = buildings_within_radius(dataset_snapshot.get(db), deadline_of(db), lat, lon, radius_km)
+            if not building_ids:
+                log_warning(
+                    action="Запрос организаций по локации",
+                    message="Нет зданий в указанной области"
+                )
+                return error_response(
+                    message="Организации не найдены в данной области",
+                    status_code=status.HTTP_404_NOT_FOUND
+                )
+
+            # Получаем организации в найденных зданиях
+            organizations = (
+                db.execute(queries.READ_MODEL_BY_BUILDINGS, {"building_ids": building_ids})
+                .all()
+            )
 
         elif search_type == "rectangle":
-            # Фильтруем здания по границам прямоугольника
-            buildings_in_rectangle = buildings_query.filter(
-                Building.latitude.between(min_lat, max_lat),
-                Building.longitude.between(min_lon, max_lon)
-            ).all()
-            building_ids = [b.id for b in buildings_in_rectangle]
+            # Фильтруем организации по координатам их зданий прямо в модели чтения
+            organizations = (
+                db.execute(
+                    queries.READ_MODEL_IN_RECTANGLE,
+                    {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon}
+                )
+                .all()
+            )
 
         else:
             log_warning(
@@ -244,54 +233,26 @@ async def get_by_location(
                 status_code=status.HTTP_400_BAD_REQUEST
             )
 
-        if not building_ids:
-            log_warning(
-                action="Запрос организаций по локации",
-                message="Нет зданий в указанной области"
-            )
-            return error_response(
-                message="Организации не найдены в данной области",
-                status_code=status.HTTP_404_NOT_FOUND
-            )
-
-        # Получаем организации в найденных зданиях
-        organizations = (
-            db.query(Organization)
-            .options(joinedload(Organization.building))
-            .filter(Organization.building_id.in_(building_ids))
-            .all()
-        )
-
         if not organizations:
             log_warning(
                 action="Запрос организаций по локации",
-                message="Нет организаций в найденных зданиях"
+                message="Нет организаций в указанной области"
             )
             return error_response(
                 message="Организации не найдены",
                 status_code=status.HTTP_404_NOT_FOUND
             )
 
-        result = [
-            OrganizationRequestSchema(
-                id=org.id,
-                name=org.name,
-                phone_numbers=json.loads(org.phone_numbers),
-                activities=[activity.name for activity in org.activities],
-                address=org.building.address,
-                latitude=org.building.latitude,
-                longitude=org.building.longitude
-            )
-            for org in organizations
-        ]
+        fragments = fragment_cache.get_many(db, organizations)
 
         log_info(
             action="Запрос организаций по локации",
-            message=f"Найдено {len(result)} значений"
+            message=f"Найдено {len(fragments)} значений"
         )
-        return success_response(
+        return fragments_response(
             message="Данные успешно получены",
-            data=result
+            data=join_fragments(fragments),
+            response=response
         )
 
     except SQLAlchemyError as e:
@@ -310,7 +271,8 @@ async def get_by_location(
             status_code=status.HTTP_200_OK,
             response_model=BaseResponse[OrganizationRequestSchema]
             )
-async def get_by_id(organization_id: int, db: Session = Depends(get_db)):
+@single_flight
+def get_by_id(organization_id: int, response: Response, db: Session = Depends(get_db)):
     """
     Поиск организаций по её идентификатору
     """
@@ -322,13 +284,12 @@ async def get_by_id(organization_id: int, db: Session = Depends(get_db)):
 
     try:
         organization = (
-            db.query(Organization)
-            .options(joinedload(Organization.activities), joinedload(Organization.building))
-            .filter(Organization.id == organization_id)
+            db.execute(queries.READ_MODEL_BY_ID, {"organization_id": organization_id})
             .first()
         )
+        fragments = fragment_cache.get_many(db, [organization]) if organization else []
 
-        if not organization:
+        if not fragments:
             log_warning(
                 action="Поиск организации по ее ID",
                 message=f"Организации с данным ID {organization_id} нет"
@@ -338,24 +299,15 @@ async def get_by_id(organization_id: int, db: Session = Depends(get_db)):
                 status_code=status.HTTP_404_NOT_FOUND
             )
 
-        result = OrganizationRequestSchema(
-            id=organization.id,
-            name=organization.name,
-            phone_numbers=json.loads(organization.phone_numbers),
-            activities=[activity.name for activity in organization.activities],
-            address=organization.building.address,
-            latitude=organization.building.latitude,
-            longitude=organization.building.longitude
-        )
-
         log_info(
             action='Поиск организации по ее ID',
             message="Успешный запрос"
         )
 
-        return success_response(
+        return fragments_response(
             message="Данные успешно получены",
-            data=result
+            data=fragments[0],
+            response=response
         )
 
     except SQLAlchemyError as e:
@@ -375,9 +327,10 @@ async def get_by_id(organization_id: int, db: Session = Depends(get_db)):
     status_code=status.HTTP_200_OK,
     response_model=BaseResponse[List[OrganizationRequestSchema]]
 )
-async def get_by_activity_hierarchy(activity_id: int, db: Session = Depends(get_db)):
+@single_flight
+def get_by_activity_hierarchy(activity_id: int, response: Response, db: Session = Depends(get_db)):
     """
-    Поиск организаций по виду деятельности, включая вложенность до 3 уровней.
+    Поиск организаций по виду деятельности, включая вложенность до ACTIVITY_HIERARCHY_DEPTH уровней (по умолчанию 3).
     """
 
     log_info(
@@ -387,34 +340,18 @@ async def get_by_activity_hierarchy(activity_id: int, db: Session = Depends(get_
 
     try:
         # Проверяем, существует ли указанный вид деятельности
-        root_activity = db.query(Activity).filter(Activity.id == activity_id).first()
-        if not root_activity:
+        tree = activity_tree.get(db)
+        if not tree.exists(activity_id):
             return error_response(
                 message=f"Вид деятельности с ID {activity_id} не найден",
                 status_code=status.HTTP_404_NOT_FOUND
             )
 
-        # Рекурсивно ищем всех потомков до 3 уровня
-        def get_child_activities(parent_ids, depth=0):
-            if depth >= 3:  # Ограничение глубины поиска
-                return set()
-            child_activities = db.query(Activity.id).filter(Activity.parent_id.in_(parent_ids)).all()
-            child_ids = {a[0] for a in child_activities}
-            if child_ids:
-                return child_ids | get_child_activities(child_ids, depth + 1)
-            return child_ids
-
-        activity_ids = {activity_id} | get_child_activities({activity_id})
+        # Вид деятельности и его потомки с ограничением по глубине — срез дерева в памяти
+        activity_ids = tree.descendants(activity_id, ACTIVITY_HIERARCHY_DEPTH)
 
         organizations = (
-            db.query(Organization)
-            .join(Organization.activities)
-            .outerjoin(Organization.building)
-            .options(
-                joinedload(Organization.activities),  # Чтобы не было доп. SQL-запросов
-                joinedload(Organization.building)  # Загружаем информацию о здании
-            )
-            .filter(Organization.activities.any(Activity.id.in_(activity_ids)))  # Фильтр по списку ID
+            db.execute(queries.READ_MODEL_BY_ACTIVITIES, {"activity_ids": activity_ids})
             .all()
         )
 
@@ -424,27 +361,17 @@ async def get_by_activity_hierarchy(activity_id: int, db: Session = Depends(get_
                 status_code=status.HTTP_404_NOT_FOUND
             )
 
-        result = [
-            OrganizationRequestSchema(
-                id=org.id,
-                name=org.name,
-                phone_numbers=json.loads(org.phone_numbers),
-                activities=[activity.name for activity in org.activities],
-                address=org.building.address,
-                latitude=org.building.latitude,
-                longitude=org.building.longitude
-            )
-            for org in organizations
-        ]
+        fragments = fragment_cache.get_many(db, organizations)
 
         log_info(
             action="Поиск организаций по иерархии видов деятельности",
-            message=f"Найдено {len(result)} значений"
+            message=f"Найдено {len(fragments)} значений"
         )
 
-        return success_response(
+        return fragments_response(
             message="Данные успешно получены",
-            data=result
+            data=join_fragments(fragments),
+            response=response
         )
 
     except SQLAlchemyError as e:
@@ -464,8 +391,10 @@ async def get_by_activity_hierarchy(activity_id: int, db: Session = Depends(get_
     status_code=status.HTTP_200_OK,
     response_model=BaseResponse[List[OrganizationRequestSchema]]
 )
-async def get_by_name(
+@single_flight
+def get_by_name(
         name: str,
+        response: Response,
         db: Session = Depends(get_db)
 ):
     """
@@ -479,9 +408,7 @@ async def get_by_name(
 
     try:
         organizations = (
-            db.query(Organization)
-            .options(joinedload(Organization.building))
-            .filter(Organization.name.ilike(f"%{name}%"))  #  регистронезависимо
+            db.execute(queries.READ_MODEL_BY_NAME, {"pattern": f"%{name}%"})  # регистронезависимо
             .all()
         )
 
@@ -496,27 +423,17 @@ async def get_by_name(
             )
 
         # 🔹 Формируем ответ
-        result = [
-            OrganizationRequestSchema(
-                id=org.id,
-                name=org.name,
-                phone_numbers=json.loads(org.phone_numbers),
-                activities=[activity.name for activity in org.activities],
-                address=org.building.address,
-                latitude=org.building.latitude,
-                longitude=org.building.longitude
-            )
-            for org in organizations
-        ]
+        fragments = fragment_cache.get_many(db, organizations)
 
         log_info(
             action="Поиск организаций по названию",
-            message=f"Найдено {len(result)} значений"
+            message=f"Найдено {len(fragments)} значений"
         )
 
-        return success_response(
+        return fragments_response(
             message="Данные успешно получены",
-            data=result
+            data=join_fragments(fragments),
+            response=response
         )
 
     except SQLAlchemyError as e:
@@ -529,3 +446,43 @@ async def get_by_name(
             message="Ошибка сервера при обработке запроса",
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@router.get(
+    "/autocomplete",
+    status_code=status.HTTP_200_OK,
+    response_model=BaseResponse[List[OrganizationSuggestionSchema]]
+)
+def get_autocomplete(
+        q: str = Query(min_length=1, max_length=100),
+        limit: int = Query(AUTOCOMPLETE_TOP_K, ge=1, le=AUTOCOMPLETE_TOP_K),
+        db: Session = Depends(get_db)
+):
+    """
+    Подсказки для строки поиска: ID и названия организаций, в которых какое-то слово начинается с q.
+    Отвечает из индекса в памяти, без SQL, поэтому его можно вызывать на каждое нажатие клавиши.
+    """
+
+    # Запросов много, поэтому пишем их только в отладочный лог
+    log_debug(
+        action="Автодополнение названий организаций",
+        message=f"Префикс: {q}"
+    )
+
+    try:
+        suggestions = autocomplete.get(db).suggest(q, limit)
+    except SQLAlchemyError as e:
+        db.rollback()
+        log_error(
+            action="Автодополнение названий организаций",
+            message=f"Ошибка SQLAlchemy: {str(e)}"
+        )
+        return error_response(
+            message="Ошибка сервера при обработке запроса",
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    return success_response(
+        message="Данные успешно получены",
+        data=[OrganizationSuggestionSchema(id=organization_id, name=name) for organization_id, name in suggestions]
+    )
@@ -0,0 +1,46 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, status
+
+from utils.metrics import metrics
+from utils.responses import BaseResponse, error_response, success_response
+from utils.warmup import warmup_state
+
+router = APIRouter()
+
+
+@router.get("/metrics", status_code=status.HTTP_200_OK, response_model=BaseResponse[Dict[str, float]])
+def get_metrics():
+    """
+    Метрики процесса: очереди и сброшенные запросы контроля нагрузки и др.
+    """
+    return success_response(
+        message="Метрики сервиса",
+        data=metrics.snapshot()
+    )
+
+
+@router.get("/health/live", status_code=status.HTTP_200_OK, response_model=BaseResponse[None])
+def get_liveness():
+    """
+    Процесс жив и обрабатывает запросы (без обращения к БД)
+    """
+    return success_response(message="Сервис работает")
+
+
+@router.get("/health/ready", status_code=status.HTTP_200_OK, response_model=BaseResponse[Dict[str, Any]])
+def get_readiness():
+    """
+    Воркер прогрет и готов принимать трафик. До окончания прогрева — 503
+    """
+    if not warmup_state.ready:
+        # Текст исключения (SQL, адреса БД) наружу не отдаём — он есть в логе прогрева
+        error_response(
+            message="Сервис прогревается",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            data={"state": "retrying" if warmup_state.error else "warming_up", "stages": warmup_state.stages}
+        )
+    return success_response(
+        message="Сервис готов",
+        data={"stages": warmup_state.stages}
+    )
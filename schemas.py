@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -15,3 +15,54 @@ class OrganizationRequestSchema(BaseModel):
     class Config:
         from_attributes = True  # Автоматическое преобразование из SQLAlchemy-объектов
 
+
+class OrganizationSuggestionSchema(BaseModel):
+    """Подсказка автодополнения: только ID и название"""
+    id: int
+    name: str
+
+
+class ActivityFacetSchema(BaseModel):
+    """Количество организаций с видом деятельности"""
+    id: int
+    name: str
+    parent_id: Optional[int] = None
+    count: int
+
+
+class BuildingUpsertSchema(BaseModel):
+    id: int
+    address: str
+    latitude: float
+    longitude: float
+
+
+class ActivityUpsertSchema(BaseModel):
+    id: int
+    name: str
+    parent_id: Optional[int] = None
+
+
+class OrganizationUpsertSchema(BaseModel):
+    id: int
+    name: str
+    phone_numbers: List[str] = []
+    building_id: int
+    activity_ids: List[int] = []
+
+
+class BulkUpsertSchema(BaseModel):
+    """Пакет изменений справочника, формат совпадает с test_data.json"""
+    buildings: List[BuildingUpsertSchema] = []
+    activities: List[ActivityUpsertSchema] = []
+    organizations: List[OrganizationUpsertSchema] = []
+
+
+class BulkUpsertResultSchema(BaseModel):
+    buildings: int
+    activities: int
+    organizations: int
+    links_added: int
+    links_removed: int
+    seconds: float
+    records_per_second: float
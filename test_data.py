@@ -1,23 +1,41 @@
 import json
+from sqlalchemy import or_, select
 from sqlalchemy.orm import Session
 from database import SessionLocal
 from models import Building, Activity, Organization
+from utils.read_model import refresh_read_model
 
-# Загружаем JSON-файл
-with open("test_data.json", "r", encoding="utf-8") as file:
-    data = json.load(file)
+TEST_DATA_FILE = "test_data.json"
 
+# Одна проверка вместо трёх: есть ли в базе хоть какие-то данные
+HAS_ANY_DATA = select(or_(
+    select(Building.id).exists(),
+    select(Activity.id).exists(),
+    select(Organization.id).exists(),
+))
 
-def insert_test_data():
+
+def load_test_data_file(path: str = TEST_DATA_FILE) -> dict:
+    # JSON читаем только когда действительно нужно загружать данные, а не при импорте модуля
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def insert_test_data() -> bool:
+    """
+    Загружает тестовые данные в пустую базу.
+    Возвращает True, если данные загружены или уже были в базе, и False при ошибке.
+    """
     db: Session = SessionLocal()
 
     try:
         # Проверяем, есть ли уже данные в базе
-        if db.query(Building).first() or db.query(Activity).first() or db.query(Organization).first():
+        if db.execute(HAS_ANY_DATA).scalar():
             print("✅ База уже содержит тестовые данные. Пропускаем загрузку.")
-            return
+            return True
 
         print("ℹ️ Загружаем тестовые данные в базу...")
+        data = load_test_data_file()
 
         # 1. Загружаем здания
         for b in data["buildings"]:
@@ -25,8 +43,10 @@ def insert_test_data():
             db.add(building)
 
         # 2. Загружаем виды деятельности
+        activities = {}
         for a in data["activities"]:
             activity = Activity(id=a["id"], name=a["name"], parent_id=a["parent_id"])
+            activities[activity.id] = activity
             db.add(activity)
 
         # 3. Загружаем организации и связываем их с видами деятельности
@@ -38,20 +58,23 @@ def insert_test_data():
                 building_id=o["building_id"]
             )
             db.add(organization)
-            db.flush()  # Обновляем объект в БД, чтобы получить его ID
 
-            # Добавляем связи организация ↔ деятельность
+            # Добавляем связи организация ↔ деятельность (виды деятельности уже есть в сессии)
             for activity_id in o["activity_ids"]:
-                activity = db.query(Activity).filter(Activity.id == activity_id).first()
+                activity = activities.get(activity_id)
                 if activity:
                     organization.activities.append(activity)
 
+        db.flush()
+        refresh_read_model(db)
         db.commit()
         print("✅ Данные успешно загружены в базу!")
+        return True
 
     except Exception as e:
         db.rollback()
         print(f"❌ Ошибка при загрузке данных: {e}")
+        return False
 
     finally:
         db.close()
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+# Тесты импортируют модули сервиса так же, как main.py — от корня репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def database_url(monkeypatch):
+    # Модули сервиса создают движок БД при импорте (database.py). Тестам чистой логики база не нужна:
+    # если DATABASE_URL не задан, хватит SQLite в памяти
+    monkeypatch.setenv("DATABASE_URL", os.getenv("DATABASE_URL") or "sqlite://")
@@ -0,0 +1,64 @@
+import importlib
+
+import pytest
+
+# 1 ─┬─ 2 ── 4 ── 5
+#    └─ 3
+ROWS = [
+    (1, "Еда", None),
+    (2, "Мясная продукция", 1),
+    (3, "Молочная продукция", 1),
+    (4, "Колбасы", 2),
+    (5, "Сырокопчёные", 4),
+]
+
+
+@pytest.fixture
+def ActivityTree(database_url):
+    return importlib.import_module("utils.activity_tree").ActivityTree
+
+
+def test_descendants_without_depth_limit(ActivityTree):
+    tree = ActivityTree(ROWS)
+
+    assert tree.descendants(1) == [1, 2, 4, 5, 3]
+    assert tree.descendants(4) == [4, 5]
+    assert tree.descendants(3) == [3]
+
+
+def test_descendants_respect_depth_limit(ActivityTree):
+    tree = ActivityTree(ROWS)
+
+    assert tree.descendants(1, max_depth=0) == [1]
+    assert tree.descendants(1, max_depth=1) == [1, 2, 3]
+    assert tree.descendants(1, max_depth=2) == [1, 2, 4, 3]
+    # Глубина считается от запрошенного узла, а не от корня
+    assert tree.descendants(2, max_depth=1) == [2, 4]
+
+
+def test_is_descendant_and_exists(ActivityTree):
+    tree = ActivityTree(ROWS)
+
+    assert tree.is_descendant(5, 1)
+    assert tree.is_descendant(2, 2)
+    assert not tree.is_descendant(3, 2)
+    assert not tree.is_descendant(1, 5)
+    assert tree.exists(5)
+    assert not tree.exists(99)
+
+
+def test_unknown_parent_makes_a_root(ActivityTree):
+    tree = ActivityTree(ROWS + [(6, "Без родителя", 42)])
+
+    assert tree.descendants(6) == [6]
+    assert not tree.is_descendant(6, 1)
+
+
+def test_cycles_are_walked_once(ActivityTree):
+    # 7 → 8 → 9 → 7 и узел, который сам себе родитель: корней нет, но обход должен завершиться
+    tree = ActivityTree(ROWS + [(7, "A", 9), (8, "B", 7), (9, "C", 8), (10, "D", 10)])
+
+    assert sorted(tree.descendants(7)) == [7, 8, 9]
+    assert tree.descendants(7, max_depth=1) == [7, 8]
+    assert tree.descendants(10) == [10]
+    assert len(tree.order) == len(set(tree.order)) == 9
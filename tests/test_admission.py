@@ -0,0 +1,60 @@
+import asyncio
+import random
+
+import pytest
+
+import utils.admission as admission
+from utils.admission import AdaptiveLimiter
+
+
+def test_in_flight_survives_concurrent_timeouts_and_cancellations(monkeypatch):
+    # Очередь с очень коротким ожиданием: таймауты, отмены и освобождение слотов постоянно совпадают
+    monkeypatch.setattr(admission, "ADMISSION_QUEUE_TIMEOUT", 0.001)
+    monkeypatch.setattr(admission, "ADMISSION_QUEUE_SIZE", 1000)
+    monkeypatch.setattr(admission, "ADMISSION_TARGET_LATENCY", 0)
+    limiter = AdaptiveLimiter("test_race", 3)
+    observed = []
+
+    async def request():
+        if await limiter.acquire():
+            observed.append(limiter.in_flight)
+            try:
+                await asyncio.sleep(random.choice([0, 0.0005, 0.001]))
+            finally:
+                limiter.release(0)
+        observed.append(limiter.in_flight)
+
+    async def main():
+        random.seed(42)
+        for _ in range(50):
+            tasks = [asyncio.create_task(request()) for _ in range(40)]
+            await asyncio.sleep(random.choice([0, 0.0005, 0.001]))
+            for task in random.sample(tasks, 10):
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(main())
+
+    assert min(observed) >= 0
+    assert max(observed) <= 3
+    assert limiter.in_flight == 0
+    assert not limiter._waiters
+
+
+def test_limit_backs_off_once_per_latency_window(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_TARGET_LATENCY", 0.5)
+    now = [100.0]
+    monkeypatch.setattr(admission.time, "perf_counter", lambda: now[0])
+    limiter = AdaptiveLimiter("test_backoff", 16)
+    limiter.in_flight = 16
+
+    # Всплеск задержки: все 16 запросов, начатых одновременно, завершаются медленно
+    for _ in range(16):
+        limiter.release(1.0)
+    assert limiter.limit == pytest.approx(16 * admission.BACKOFF_RATIO)
+
+    # Медленный запрос, начатый уже после уменьшения, — это следующее окно
+    now[0] += 2
+    limiter.in_flight = 1
+    limiter.release(1.0)
+    assert limiter.limit == pytest.approx(16 * admission.BACKOFF_RATIO ** 2)
@@ -0,0 +1,80 @@
+import importlib
+import random
+
+import pytest
+
+NAMES = {
+    1: "ООО 'ТехноСфера'",
+    2: "Ёлки-Палки",
+    3: "Техносила",
+    4: "Рога и копыта",
+    5: "«Елочка»",
+}
+
+
+@pytest.fixture
+def autocomplete(database_url):
+    return importlib.import_module("utils.autocomplete")
+
+
+def test_normalize_ignores_case_yo_and_punctuation(autocomplete):
+    assert autocomplete.normalize("  Ёлки-Палки,  «ООО»! ") == "елки палки ооо"
+    assert autocomplete.normalize("snake_case") == "snake case"
+
+
+def test_keys_start_at_every_word(autocomplete):
+    assert autocomplete.keys_of("ООО 'ТехноСфера'") == ["ооо техносфера", "техносфера"]
+
+
+def test_suggest_matches_any_word_and_short_names_first(autocomplete):
+    index = autocomplete.AutocompleteIndex.build(NAMES)
+
+    assert index.suggest("техно") == [(3, "Техносила"), (1, "ООО 'ТехноСфера'")]
+    # Короткий префикс берётся из заранее посчитанного top-k, «ё» и «е» не различаются
+    assert [organization_id for organization_id, _ in index.suggest("ёл")] == [5, 2]
+    assert index.suggest("палки") == [(2, "Ёлки-Палки")]
+    assert index.suggest("!!!") == []
+
+
+def random_name(rng):
+    words = ["Техно", "Ёлка", "Сфера", "Рога", "копыта", "ООО", "ИП", "«Ель»", "тех", "е"]
+    return " ".join(rng.choice(words) for _ in range(rng.randint(1, 3)))
+
+
+def assert_same_index(actual, expected):
+    assert actual.names == expected.names
+    assert actual.entries == expected.entries
+    assert actual.ranks == expected.ranks
+    assert actual.top == expected.top
+
+
+def test_incremental_update_matches_full_rebuild(autocomplete):
+    rng = random.Random(42)
+    names = {organization_id: random_name(rng) for organization_id in range(1, 60)}
+    index = autocomplete.AutocompleteIndex.build(names)
+
+    for _ in range(50):
+        names = dict(names)
+        changed_ids = set()
+        for _ in range(rng.randint(1, 5)):
+            organization_id = rng.randint(1, 80)
+            if organization_id in names and rng.random() < 0.3:
+                del names[organization_id]
+            else:
+                names[organization_id] = random_name(rng)
+            changed_ids.add(organization_id)
+
+        index = index.with_changes(names, changed_ids)
+
+        assert_same_index(index, autocomplete.AutocompleteIndex.build(names))
+
+
+def test_incremental_update_keeps_previous_index_intact(autocomplete):
+    index = autocomplete.AutocompleteIndex.build(NAMES)
+
+    updated = index.with_changes({**NAMES, 3: "Рогатка"}, {3})
+
+    assert [organization_id for organization_id, _ in updated.suggest("техно")] == [1]
+    assert [organization_id for organization_id, _ in updated.suggest("рог")] == [3, 4]
+    # Старый индекс продолжает обслуживать текущие запросы без изменений
+    assert [organization_id for organization_id, _ in index.suggest("техно")] == [3, 1]
@@ -0,0 +1,73 @@
+import json
+import os
+
+import pytest
+
+# Нарушение внешнего ключа проверяется настоящим PostgreSQL со схемой из миграций (python boot.py init).
+# Тесты пишут в базу, поэтому запускаются только на явно указанной тестовой базе: DATABASE_URL не годится,
+# его подставляет и .env (load_dotenv в database.py), а там может быть рабочая база
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="нужна тестовая база PostgreSQL в TEST_DATABASE_URL")
+
+MISSING_ID = 2_000_000_000
+TEST_DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_data.json")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", TEST_DATABASE_URL)
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+
+    import database
+    import main
+    import routers.bulk
+
+    # database.py мог быть импортирован раньше с другим адресом: все запросы — только в тестовую базу
+    monkeypatch.setattr(database, "engine", create_engine(TEST_DATABASE_URL))
+    monkeypatch.setattr(database, "replica_pool", database.ReplicaPool([], database.REPLICA_BALANCING))
+    monkeypatch.setattr(routers.bulk, "BULK_API_KEY", "test-key")
+    return TestClient(main.app)
+
+
+def upsert(client, batch):
+    return client.post("/api/bulk/upsert", json=batch, headers={"X-API-Key": "test-key"})
+
+
+def test_unknown_building_is_rejected_with_422(client):
+    response = upsert(client, {"organizations": [
+        {"id": MISSING_ID, "name": "Нет здания", "building_id": MISSING_ID}
+    ]})
+
+    assert response.status_code == 422
+    assert response.json()["detail"]["data"] == {"constraint": "organizations_building_id_fkey"}
+
+
+def test_unknown_activity_is_rejected_with_422(client):
+    response = upsert(client, {"organizations": [
+        {"id": MISSING_ID, "name": "Нет деятельности", "building_id": 1, "activity_ids": [MISSING_ID]}
+    ]})
+
+    assert response.status_code == 422
+    assert response.json()["detail"]["data"]["constraint"].startswith("organization_activities_activity_id")
+    # Пакет откатился целиком: организация не появилась
+    assert client.get(f"/api/by_id/{MISSING_ID}").status_code == 404
+
+
+def test_repeated_id_in_batch_keeps_the_last_record(client):
+    with open(TEST_DATA_FILE, encoding="utf-8") as file:
+        building = json.load(file)["buildings"][0]
+
+    # Вторая запись возвращает исходный адрес, так что данные справочника не меняются
+    response = upsert(client, {"buildings": [{**building, "address": "Временный адрес"}, building]})
+
+    assert response.status_code == 200
+    assert response.json()["data"]["buildings"] == 1
+    organizations = client.get(f"/api/by_building/{building['id']}").json()["data"]
+    assert organizations and all(o["address"] == building["address"] for o in organizations)
+
+
+def test_non_ascii_api_key_is_rejected_with_401(client):
+    response = client.post("/api/bulk/upsert", json={}, headers={"X-API-Key": b"\xe9"})
+
+    assert response.status_code == 401
@@ -0,0 +1,84 @@
+import importlib
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+
+MARKER = text("SELECT name FROM marker")
+
+
+def make_database(path, name):
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE marker (name TEXT)")
+        connection.execute("INSERT INTO marker VALUES (?)", (name,))
+    return f"sqlite:///{path}"
+
+
+@pytest.fixture
+def database(monkeypatch, tmp_path):
+    # Основная БД и реплики — отдельные файлы SQLite: по содержимому видно, куда ушёл запрос
+    primary_url = make_database(tmp_path / "primary.db", "primary")
+    monkeypatch.setenv("DATABASE_URL", primary_url)
+    module = importlib.import_module("database")
+    monkeypatch.setattr(module, "engine", create_engine(primary_url))
+    return module
+
+
+def use_replicas(monkeypatch, database, *urls):
+    pool = database.ReplicaPool(urls, "round_robin")
+    monkeypatch.setattr(database, "replica_pool", pool)
+    return pool
+
+
+def read_marker(database, method="GET"):
+    request = SimpleNamespace(method=method, state=SimpleNamespace())
+    sessions = database.get_db(request)
+    db = next(sessions)
+    try:
+        return db.execute(MARKER).scalar()
+    finally:
+        sessions.close()
+
+
+def test_get_reads_from_replica_and_post_from_primary(monkeypatch, tmp_path, database):
+    use_replicas(monkeypatch, database, make_database(tmp_path / "replica.db", "replica"))
+
+    assert read_marker(database, "GET") == "replica"
+    assert read_marker(database, "POST") == "primary"
+
+
+def test_replicas_are_used_round_robin(monkeypatch, tmp_path, database):
+    use_replicas(
+        monkeypatch, database,
+        make_database(tmp_path / "replica1.db", "replica1"),
+        make_database(tmp_path / "replica2.db", "replica2"),
+    )
+
+    names = [read_marker(database) for _ in range(4)]
+
+    assert sorted(names[:2]) == ["replica1", "replica2"]
+    assert names[2:] == names[:2]
+
+
+def test_replica_with_connection_error_is_ejected(monkeypatch, tmp_path, database):
+    # Файл в несуществующем каталоге SQLite открыть не может — ошибка соединения
+    broken_url = f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"
+    pool = use_replicas(monkeypatch, database, broken_url, make_database(tmp_path / "replica.db", "replica"))
+
+    assert [read_marker(database) for _ in range(3)] == ["replica"] * 3
+    broken = pool.replicas[0]
+    assert broken.ejected_until > 0
+    assert all(replica.active_connections == 0 for replica in pool.replicas)
+
+
+def test_reads_fall_back_to_primary_when_all_replicas_are_ejected(monkeypatch, tmp_path, database):
+    pool = use_replicas(
+        monkeypatch, database,
+        make_database(tmp_path / "replica1.db", "replica1"),
+        make_database(tmp_path / "replica2.db", "replica2"),
+    )
+    for replica in pool.replicas:
+        replica.eject("тест", 60)
+
+    assert read_marker(database) == "primary"
@@ -0,0 +1,47 @@
+import threading
+import time
+
+import pytest
+
+from utils.deadline import DeadlineExceeded
+from utils.single_flight import SingleFlight
+
+
+def test_followers_do_not_inherit_leader_deadline():
+    flight = SingleFlight(wait_timeout=5)
+    leader_started, release_leader = threading.Event(), threading.Event()
+    calls = []
+    results = []
+
+    def leader():
+        calls.append("leader")
+        leader_started.set()
+        release_leader.wait()
+        # Клиент лидера отключился — его SQL отменён
+        raise DeadlineExceeded("Клиент отключился")
+
+    def follower():
+        calls.append("follower")
+        return "own result"
+
+    def run_leader():
+        with pytest.raises(DeadlineExceeded):
+            flight.do("key", leader)
+
+    threads = [threading.Thread(target=run_leader)]
+    threads[0].start()
+    leader_started.wait()
+    threads += [threading.Thread(target=lambda: results.append(flight.do("key", follower))) for _ in range(3)]
+    for thread in threads[1:]:
+        thread.start()
+    # Последователи успевают встать в ожидание результата лидера
+    time.sleep(0.2)
+    assert calls == ["leader"]
+
+    release_leader.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["own result"] * 3
+    # Ожидавшие запросы снова объединились: вычисление выполнил один из них
+    assert calls.count("follower") >= 1
@@ -0,0 +1,113 @@
+# Дерево видов деятельности в памяти процесса
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from utils.snapshot import dataset_snapshot
+
+# Глубина поиска по иерархии видов деятельности (сколько уровней потомков учитывать)
+ACTIVITY_HIERARCHY_DEPTH = int(os.getenv("ACTIVITY_HIERARCHY_DEPTH", "3"))
+
+
+class ActivityTree:
+    """
+    Неизменяемый снимок дерева видов деятельности.
+
+    Узлы обходятся в глубину, и для каждого узла запоминается интервал [tin, tout) в порядке обхода
+    (интервалы Эйлерова обхода). Все потомки узла лежат в order[tin:tout], поэтому проверка
+    «является ли узел потомком» выполняется за O(1), а список потомков — срезом без SQL.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[int, str, Optional[int]]]):
+        self.names: Dict[int, str] = {}
+        self.parents: Dict[int, Optional[int]] = {}
+        self.children: Dict[int, List[int]] = {}
+        for activity_id, name, parent_id in rows:
+            self.names[activity_id] = name
+            self.parents[activity_id] = parent_id
+            self.children.setdefault(activity_id, [])
+        for activity_id, parent_id in self.parents.items():
+            if parent_id in self.children:
+                self.children[parent_id].append(activity_id)
+
+        self.order: List[int] = []
+        self.tin: Dict[int, int] = {}
+        self.tout: Dict[int, int] = {}
+        self.depth: Dict[int, int] = {}
+
+        roots = [a for a, parent_id in self.parents.items() if parent_id not in self.children]
+        # Узлы, попавшие в цикл, не достижимы от корней — обходим их отдельно
+        for root in roots + list(self.parents):
+            if root not in self.tin:
+                self._walk(root)
+
+    def _walk(self, root: int):
+        # Обход без рекурсии, чтобы глубина дерева не упиралась в лимит стека
+        self.depth[root] = 0
+        stack = [(root, False)]
+        while stack:
+            node, leaving = stack.pop()
+            if leaving:
+                self.tout[node] = len(self.order)
+                continue
+            self.tin[node] = len(self.order)
+            self.order.append(node)
+            stack.append((node, True))
+            for child in reversed(self.children[node]):
+                if child not in self.tin:
+                    self.depth[child] = self.depth[node] + 1
+                    stack.append((child, False))
+
+    def exists(self, activity_id: int) -> bool:
+        return activity_id in self.tin
+
+    def is_descendant(self, activity_id: int, ancestor_id: int) -> bool:
+        """Лежит ли activity_id в поддереве ancestor_id (включая сам узел)"""
+        return self.tin[ancestor_id] <= self.tin[activity_id] < self.tout[ancestor_id]
+
+    def descendants(self, activity_id: int, max_depth: Optional[int] = None) -> List[int]:
+        """
+        Вид деятельности и все его потомки не глубже max_depth уровней (None — без ограничения)
+        """
+        subtree = self.order[self.tin[activity_id]:self.tout[activity_id]]
+        if max_depth is None:
+            return subtree
+        limit = self.depth[activity_id] + max_depth
+        return [node for node in subtree if self.depth[node] <= limit]
+
+
+class ActivityTreeCache:
+    """
+    Держит актуальный снимок дерева: загружается при старте и пересобирается,
+    когда меняется версия таблицы activities в снимке справочника.
+    """
+
+    def __init__(self):
+        self._tree: Optional[ActivityTree] = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def load(self, db: Session) -> ActivityTree:
+        # Строки берём из общего снимка справочника: при старте воркера это чтение mmap, а не SQL.
+        # Версия — та, с которой собран снимок: пока новый снимок собирается в фоне, она остаётся прежней
+        snapshot = dataset_snapshot.get(db)
+        tree = ActivityTree(snapshot.activity_rows())
+        self._tree, self._version = tree, snapshot.versions.get("activities")
+        return tree
+
+    def get(self, db: Session) -> ActivityTree:
+        version = dataset_snapshot.get(db).versions.get("activities")
+        tree = self._tree
+        if tree is not None and version == self._version:
+            return tree
+        with self._lock:
+            # Пока ждали блокировку, дерево мог пересобрать другой поток
+            if self._tree is not None and version == self._version:
+                return self._tree
+            return self.load(db)
+
+
+# На записи этого процесса (change_events) не подписываемся: до подмены снимка пересборка дала бы то же дерево
+activity_tree = ActivityTreeCache()
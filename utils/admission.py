@@ -0,0 +1,168 @@
+# Контроль допуска запросов: ограничение параллельности, очередь с дедлайном и сброс лишней нагрузки
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Dict
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+from logger.logging_templates import log_warning
+from utils.metrics import metrics
+
+# Сколько запросов одного маршрута выполняется одновременно (верхняя граница адаптивного лимита)
+ADMISSION_DEFAULT_LIMIT = int(os.getenv("ADMISSION_DEFAULT_LIMIT", "16"))
+# Сколько запросов может ждать в очереди, остальные сразу получают 503
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+# Сколько секунд запрос может простоять в очереди
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "1"))
+# Целевая задержка в секундах: выше неё лимит уменьшается, ниже — растёт (0 — лимит не адаптируется)
+ADMISSION_TARGET_LATENCY = float(os.getenv("ADMISSION_TARGET_LATENCY", "0.5"))
+# Значение заголовка Retry-After для сброшенных запросов, в секундах
+ADMISSION_RETRY_AFTER = os.getenv("ADMISSION_RETRY_AFTER", "1")
+
+# Отдельные лимиты для дорогих маршрутов (по префиксу пути). Остальные маршруты API делят общий лимит.
+# Можно переопределить JSON-строкой в ADMISSION_ROUTE_LIMITS
+ADMISSION_ROUTE_LIMITS: Dict[str, int] = json.loads(os.getenv("ADMISSION_ROUTE_LIMITS", "null")) or {
+    "/api/by_location": 4,
+    "/api/by_name": 8,
+}
+ADMISSION_PREFIX = "/api"
+# Маршруты без контроля допуска: пакетная запись идёт секундами и не должна уменьшать лимит для чтения
+ADMISSION_EXCLUDED_PREFIXES = ("/api/bulk",)
+
+# Множитель уменьшения лимита при превышении целевой задержки (AIMD)
+BACKOFF_RATIO = 0.9
+
+
+class AdaptiveLimiter:
+    """
+    Лимит одновременных запросов с ограниченной очередью ожидания.
+
+    Лимит подстраивается по принципу AIMD: если запрос выполнялся дольше целевой задержки,
+    лимит умножается на BACKOFF_RATIO, иначе растёт на 1/лимит (примерно +1 за «окно» запросов).
+    Уменьшение — не чаще раза за окно: медленные запросы, начатые до последнего уменьшения,
+    отражают тот же всплеск задержки и лимит повторно не снижают.
+    Работает в одном event loop, поэтому блокировки не нужны.
+    """
+
+    def __init__(self, name: str, max_limit: int):
+        self.name = name
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._decreased_at = float("-inf")
+        self._waiters = deque()
+
+        metrics.gauge(f"admission.{name}.limit", lambda: int(self.limit))
+        metrics.gauge(f"admission.{name}.in_flight", lambda: self.in_flight)
+        metrics.gauge(f"admission.{name}.queue_depth", lambda: len(self._waiters))
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < max(1, int(self.limit))
+
+    async def acquire(self) -> bool:
+        """
+        Ждёт свободный слот. Возвращает False, если запрос нужно сбросить.
+        """
+        if self._has_slot() and not self._waiters:
+            self.in_flight += 1
+            return True
+
+        if len(self._waiters) >= ADMISSION_QUEUE_SIZE:
+            metrics.inc(f"admission.{self.name}.shed_queue_full")
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        metrics.inc(f"admission.{self.name}.queued")
+        try:
+            await asyncio.wait_for(waiter, ADMISSION_QUEUE_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # Слот мог быть выдан одновременно с таймаутом или отменой: тогда _wake уже учёл его в in_flight
+            granted = waiter.done() and not waiter.cancelled()
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                # Клиент ушёл, пока ждал в очереди: выданный слот возвращаем
+                if granted:
+                    self.in_flight -= 1
+                    self._wake()
+                raise
+            if not granted:
+                metrics.inc(f"admission.{self.name}.shed_queue_timeout")
+                return False
+            # Раз слот уже занят, пропускаем запрос
+        return True
+
+    def release(self, latency: float):
+        if ADMISSION_TARGET_LATENCY > 0:
+            now = time.perf_counter()
+            if latency > ADMISSION_TARGET_LATENCY:
+                if now - latency >= self._decreased_at:
+                    self.limit = max(1.0, self.limit * BACKOFF_RATIO)
+                    self._decreased_at = now
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self._has_slot():
+            waiter = self._waiters.popleft()
+            # Ожидание могло уже закончиться по таймауту или отмене — такому запросу слот не нужен
+            if waiter.done() or waiter.cancelled():
+                continue
+            self.in_flight += 1
+            waiter.set_result(True)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI-middleware перед маршрутами API: пропускает запрос, ставит его в очередь
+    или сразу отвечает 503 с Retry-After, чтобы перегрузка не превращалась в таймауты у всех.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.shared = AdaptiveLimiter(ADMISSION_PREFIX, ADMISSION_DEFAULT_LIMIT)
+        self.limiters = {prefix: AdaptiveLimiter(prefix, limit) for prefix, limit in ADMISSION_ROUTE_LIMITS.items()}
+
+    def _limiter_for(self, path: str) -> AdaptiveLimiter:
+        for prefix, limiter in self.limiters.items():
+            if path.startswith(prefix):
+                return limiter
+        return self.shared
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith(ADMISSION_PREFIX)
+            or scope["path"].startswith(ADMISSION_EXCLUDED_PREFIXES)
+        ):
+            return await self.app(scope, receive, send)
+
+        limiter = self._limiter_for(scope["path"])
+        if not await limiter.acquire():
+            log_warning(
+                action="Контроль нагрузки",
+                message=f"Запрос к {scope['path']} сброшен: лимит {int(limiter.limit)}, в очереди {len(limiter._waiters)}"
+            )
+            response = JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"detail": {
+                    "status": "error",
+                    "message": "Сервер перегружен, повторите запрос позже",
+                    "data": None,
+                }},
+                headers={"Retry-After": ADMISSION_RETRY_AFTER},
+            )
+            return await response(scope, receive, send)
+
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - started_at)
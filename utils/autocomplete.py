@@ -0,0 +1,167 @@
+# Автодополнение названий организаций: отсортированный массив ключей и готовые top-k для коротких префиксов
+import bisect
+import heapq
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from logger.logging_templates import log_info
+from utils.snapshot import Snapshot, dataset_snapshot
+
+# Сколько подсказок хранить и отдавать на префикс
+AUTOCOMPLETE_TOP_K = int(os.getenv("AUTOCOMPLETE_TOP_K", "10"))
+# Для префиксов не длиннее этого top-k считается заранее: короткие префиксы самые частые и самые широкие
+AUTOCOMPLETE_PREFIX_LENGTH = int(os.getenv("AUTOCOMPLETE_PREFIX_LENGTH", "3"))
+# Если изменилось больше этой доли организаций, индекс собирается заново, а не правится по месту
+FULL_REBUILD_RATIO = 0.1
+
+# Всё, кроме букв и цифр, считается разделителем слов
+_SEPARATORS = re.compile(r"[\W_]+")
+# Верхняя граница для диапазона ключей с заданным префиксом
+_MAX_CHAR = "\U0010ffff"
+
+
+def normalize(text: str) -> str:
+    """Регистр и «ё» не важны, кавычки и знаки препинания — разделители слов"""
+    return " ".join(_SEPARATORS.sub(" ", text.casefold().replace("ё", "е")).split())
+
+
+def keys_of(name: str) -> List[str]:
+    """
+    Ключи поиска: нормализованное название начиная с каждого слова,
+    чтобы «техно» находило «ООО 'ТехноСфера'»
+    """
+    words = normalize(name).split(" ")
+    return list(dict.fromkeys(" ".join(words[i:]) for i in range(len(words)) if words[i]))
+
+
+def short_prefixes(key: str) -> List[str]:
+    """Префиксы ключа, для которых top-k хранится заранее"""
+    return [key[:length] for length in range(1, min(len(key), AUTOCOMPLETE_PREFIX_LENGTH) + 1)]
+
+
+def rank_of(organization_id: int, name: str) -> Tuple[int, str, int]:
+    # Сначала короткие названия (обычно это точное попадание), затем по алфавиту
+    return len(name), normalize(name), organization_id
+
+
+class AutocompleteIndex:
+    """
+    Неизменяемый индекс: после сборки его можно читать из любых потоков без блокировок.
+    Изменения создают новый индекс (with_changes), старый продолжает обслуживать текущие запросы.
+    """
+
+    def __init__(self, names: Dict[int, str], entries: List[Tuple[str, int]],
+                 ranks: Dict[int, Tuple[int, str, int]], top: Dict[str, List[int]]):
+        self.names = names
+        self.entries = entries
+        self.ranks = ranks
+        self.top = top
+
+    @classmethod
+    def build(cls, names: Dict[int, str]) -> "AutocompleteIndex":
+        entries = sorted((key, organization_id) for organization_id, name in names.items() for key in keys_of(name))
+        ranks = {organization_id: rank_of(organization_id, name) for organization_id, name in names.items()}
+
+        buckets: Dict[str, Set[int]] = {}
+        for key, organization_id in entries:
+            for prefix in short_prefixes(key):
+                buckets.setdefault(prefix, set()).add(organization_id)
+        top = {
+            prefix: heapq.nsmallest(AUTOCOMPLETE_TOP_K, ids, key=ranks.__getitem__)
+            for prefix, ids in buckets.items()
+        }
+        return cls(names, entries, ranks, top)
+
+    def _scan(self, prefix: str, limit: int) -> List[int]:
+        """Top-k перебором диапазона ключей с префиксом (бинарный поиск границ)"""
+        start = bisect.bisect_left(self.entries, (prefix,))
+        end = bisect.bisect_left(self.entries, (prefix + _MAX_CHAR,), start)
+        ids = {organization_id for _, organization_id in self.entries[start:end]}
+        return heapq.nsmallest(limit, ids, key=self.ranks.__getitem__)
+
+    def suggest(self, query: str, limit: int = AUTOCOMPLETE_TOP_K) -> List[Tuple[int, str]]:
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        if len(prefix) <= AUTOCOMPLETE_PREFIX_LENGTH and limit <= AUTOCOMPLETE_TOP_K:
+            ids = self.top.get(prefix, [])[:limit]
+        else:
+            ids = self._scan(prefix, limit)
+        return [(organization_id, self.names[organization_id]) for organization_id in ids]
+
+    def with_changes(self, names: Dict[int, str], changed_ids: Iterable[int]) -> "AutocompleteIndex":
+        """
+        Новый индекс, в котором пересчитаны только изменённые, добавленные и удалённые организации
+        и top-k только тех коротких префиксов, которых они касаются
+        """
+        entries = list(self.entries)
+        ranks = dict(self.ranks)
+        top = dict(self.top)
+        prefixes = set()
+
+        for organization_id in changed_ids:
+            old_name, new_name = self.names.get(organization_id), names.get(organization_id)
+            if old_name is not None:
+                for key in keys_of(old_name):
+                    index = bisect.bisect_left(entries, (key, organization_id))
+                    if index < len(entries) and entries[index] == (key, organization_id):
+                        del entries[index]
+                    prefixes.update(short_prefixes(key))
+                del ranks[organization_id]
+            if new_name is not None:
+                for key in keys_of(new_name):
+                    bisect.insort(entries, (key, organization_id))
+                    prefixes.update(short_prefixes(key))
+                ranks[organization_id] = rank_of(organization_id, new_name)
+
+        index = AutocompleteIndex(names, entries, ranks, top)
+        for prefix in prefixes:
+            ids = index._scan(prefix, AUTOCOMPLETE_TOP_K)
+            if ids:
+                top[prefix] = ids
+            else:
+                top.pop(prefix, None)
+        return index
+
+
+class AutocompleteCache:
+    """
+    Индекс подсказок для процесса. Названия берутся из общего снимка справочника;
+    когда снимок меняется, индекс правится только по разнице названий.
+    """
+
+    def __init__(self):
+        self._index: Optional[AutocompleteIndex] = None
+        self._snapshot: Optional[Snapshot] = None
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> AutocompleteIndex:
+        snapshot = dataset_snapshot.get(db)
+        if snapshot is self._snapshot:
+            return self._index
+        with self._lock:
+            if snapshot is not self._snapshot:
+                self._index = self._update(snapshot)
+                self._snapshot = snapshot
+            return self._index
+
+    def _update(self, snapshot: Snapshot) -> AutocompleteIndex:
+        names = dict(zip(snapshot.organization_ids, snapshot.organization_names))
+        index = self._index
+        if index is None:
+            return AutocompleteIndex.build(names)
+
+        changed_ids = {i for i, name in names.items() if index.names.get(i) != name}
+        changed_ids.update(i for i in index.names if i not in names)
+        if len(changed_ids) > max(1, len(names)) * FULL_REBUILD_RATIO:
+            return AutocompleteIndex.build(names)
+        if changed_ids:
+            log_info(action="Автодополнение", message=f"Индекс обновлён для {len(changed_ids)} организаций")
+        return index.with_changes(names, changed_ids)
+
+
+autocomplete = AutocompleteCache()
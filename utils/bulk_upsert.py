@@ -0,0 +1,160 @@
+# Пакетная запись справочника: INSERT ... ON CONFLICT DO UPDATE одной транзакцией
+import json
+import time
+from typing import Dict, List
+
+from sqlalchemy import text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from logger.logging_templates import log_info
+from models import Activity, Building, Organization
+from schemas import BulkUpsertSchema, BulkUpsertResultSchema
+from utils import change_events
+from utils.data_version import data_versions
+from utils.read_model import refresh_read_model
+
+
+def _upsert_statement(model, columns: List[str]):
+    """
+    Вставка с обновлением по id. Строки, которые не изменились, не перезаписываются,
+    чтобы не плодить лишние версии строк в PostgreSQL.
+    """
+    table = model.__table__
+    statement = insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={column: statement.excluded[column] for column in columns},
+        where=tuple_(*(table.c[column] for column in columns)).is_distinct_from(
+            tuple_(*(statement.excluded[column] for column in columns))
+        ),
+    )
+
+
+UPSERT_BUILDINGS = _upsert_statement(Building, ["address", "latitude", "longitude"])
+UPSERT_ACTIVITIES = _upsert_statement(Activity, ["name", "parent_id"])
+UPSERT_ORGANIZATIONS = _upsert_statement(Organization, ["name", "phone_numbers", "building_id"])
+
+# Связи организация ↔ деятельность передаются двумя массивами одинаковой длины
+DELETE_STALE_LINKS = text("""
+    DELETE FROM organization_activities AS link
+    WHERE link.organization_id = ANY(CAST(:organization_ids AS integer[]))
+      AND NOT EXISTS (
+          SELECT 1
+          FROM unnest(CAST(:link_organization_ids AS integer[]), CAST(:link_activity_ids AS integer[]))
+               AS wanted(organization_id, activity_id)
+          WHERE wanted.organization_id = link.organization_id AND wanted.activity_id = link.activity_id
+      )
+""")
+INSERT_MISSING_LINKS = text("""
+    INSERT INTO organization_activities (organization_id, activity_id)
+    SELECT * FROM unnest(CAST(:link_organization_ids AS integer[]), CAST(:link_activity_ids AS integer[]))
+    ON CONFLICT DO NOTHING
+""")
+
+# Явные id не сдвигают последовательности — подтягиваем их, чтобы обычные INSERT не конфликтовали
+SYNC_SEQUENCE = "SELECT setval(pg_get_serial_sequence('{table}', 'id'), max(id)) FROM {table} HAVING max(id) IS NOT NULL"
+
+
+def _parents_first(activities: List[dict]) -> List[dict]:
+    """
+    Упорядочивает виды деятельности так, чтобы родитель из той же пачки шёл раньше потомков
+    """
+    by_id: Dict[int, dict] = {a["id"]: a for a in activities}
+    depth: Dict[int, int] = {}
+    for activity_id in by_id:
+        path = []
+        node = activity_id
+        while node in by_id and node not in depth and node not in path:
+            path.append(node)
+            node = by_id[node]["parent_id"]
+        base = depth.get(node, 0)
+        for offset, item in enumerate(reversed(path), start=1):
+            depth[item] = base + offset
+    return sorted(activities, key=lambda a: depth[a["id"]])
+
+
+def _last_by_id(items: list) -> list:
+    """
+    Оставляет по одной записи на id — последнюю из пачки (как если бы записи применялись по очереди).
+    Один INSERT ... ON CONFLICT не может обновить строку дважды, а в файлах изменений повторы не редкость.
+    """
+    return list({item.id: item for item in items}.values())
+
+
+def apply_bulk_upsert(db: Session, batch: BulkUpsertSchema) -> BulkUpsertResultSchema:
+    """
+    Применяет пачку изменений одной транзакцией и уведомляет производные структуры.
+    Связи организаций с видами деятельности для организаций из пачки заменяются на переданные:
+    лишние удаляются, недостающие добавляются, совпадающие не трогаются.
+    Если id повторяется в пачке, применяется последняя запись с этим id.
+    """
+    started_at = time.perf_counter()
+
+    batch_organizations = _last_by_id(batch.organizations)
+    buildings = [b.model_dump() for b in _last_by_id(batch.buildings)]
+    activities = _parents_first([a.model_dump() for a in _last_by_id(batch.activities)])
+    organizations = [
+        {
+            "id": o.id,
+            "name": o.name,
+            "phone_numbers": json.dumps(o.phone_numbers),  # Храним как JSON-строку, как и test_data.py
+            "building_id": o.building_id,
+        }
+        for o in batch_organizations
+    ]
+    links = {"link_organization_ids": [], "link_activity_ids": []}
+    for o in batch_organizations:
+        for activity_id in set(o.activity_ids):
+            links["link_organization_ids"].append(o.id)
+            links["link_activity_ids"].append(activity_id)
+
+    links_added = links_removed = 0
+    try:
+        # insertmanyvalues сам разбивает большие списки на многострочные INSERT
+        if buildings:
+            db.execute(UPSERT_BUILDINGS, buildings)
+        if activities:
+            db.execute(UPSERT_ACTIVITIES, activities)
+        if organizations:
+            db.execute(UPSERT_ORGANIZATIONS, organizations)
+            links_removed = db.execute(
+                DELETE_STALE_LINKS, {"organization_ids": [o["id"] for o in organizations], **links}
+            ).rowcount
+            links_added = db.execute(INSERT_MISSING_LINKS, links).rowcount
+
+        for model, rows in ((Building, buildings), (Activity, activities), (Organization, organizations)):
+            if rows:
+                db.execute(text(SYNC_SEQUENCE.format(table=model.__tablename__)))
+        refresh_read_model(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # Этот процесс увидит новые версии сразу, остальные — по истечении TTL кэша версий
+    data_versions.invalidate()
+    change_events.publish(change_events.ChangeSet(
+        building_ids=(b["id"] for b in buildings),
+        activity_ids=(a["id"] for a in activities),
+        organization_ids=(o["id"] for o in organizations),
+    ))
+
+    seconds = time.perf_counter() - started_at
+    total = len(buildings) + len(activities) + len(organizations)
+    result = BulkUpsertResultSchema(
+        buildings=len(buildings),
+        activities=len(activities),
+        organizations=len(organizations),
+        links_added=links_added,
+        links_removed=links_removed,
+        seconds=round(seconds, 3),
+        records_per_second=round(total / seconds, 1) if seconds > 0 else 0.0,
+    )
+    log_info(
+        action="Пакетная запись справочника",
+        message=f"Записано {total} записей за {result.seconds} с ({result.records_per_second} записей/с)",
+        links_added=links_added,
+        links_removed=links_removed,
+    )
+    return result
@@ -12,3 +12,26 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
     return R * c  # Расстояние в километрах
+
+
+# Через сколько зданий проверять дедлайн при переборе в Python
+DEADLINE_CHECK_EVERY = 1024
+
+
+def buildings_within_radius(snapshot, deadline, lat, lon, radius_km):
+    """
+    ID зданий из снимка справочника не дальше radius_km от точки.
+    Между порциями проверяем дедлайн, чтобы огромный перебор не занимал поток бесконечно
+    """
+    building_ids = []
+    for start in range(0, len(snapshot.building_ids), DEADLINE_CHECK_EVERY):
+        deadline.check()
+        end = start + DEADLINE_CHECK_EVERY
+        building_ids.extend(
+            building_id for building_id, latitude, longitude in zip(
+                snapshot.building_ids[start:end],
+                snapshot.building_latitudes[start:end],
+                snapshot.building_longitudes[start:end],
+            ) if haversine_distance(lat, lon, latitude, longitude) <= radius_km
+        )
+    return building_ids
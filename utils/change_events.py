@@ -0,0 +1,37 @@
+# Уведомления об изменениях справочника для производных структур в памяти (кэши, индексы)
+from typing import Callable, Iterable, List
+
+from logger.logging_templates import log_error
+
+
+class ChangeSet:
+    """Идентификаторы изменённых сущностей одной пачки записи"""
+
+    def __init__(self, building_ids: Iterable[int] = (), activity_ids: Iterable[int] = (),
+                 organization_ids: Iterable[int] = ()):
+        self.building_ids = set(building_ids)
+        self.activity_ids = set(activity_ids)
+        self.organization_ids = set(organization_ids)
+
+    def __bool__(self):
+        return bool(self.building_ids or self.activity_ids or self.organization_ids)
+
+
+_subscribers: List[Callable[[ChangeSet], None]] = []
+
+
+def subscribe(callback: Callable[[ChangeSet], None]):
+    _subscribers.append(callback)
+
+
+def publish(changes: ChangeSet):
+    """
+    Сообщает подписчикам этого процесса об изменениях. Другие процессы узнают о них
+    по версии данных (data_versions), которую увеличивают триггеры в БД.
+    """
+    for callback in _subscribers:
+        try:
+            callback(changes)
+        except Exception as e:
+            # Ошибка одного подписчика не должна мешать остальным
+            log_error(action="Уведомление об изменениях", message=f"Ошибка подписчика {callback}: {str(e)}")
@@ -0,0 +1,218 @@
+# Сжатие ответов (gzip / brotli / zstd) с кэшем уже сжатых тел
+import gzip
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import anyio.to_thread
+
+from utils.conditional import etag_with_encoding
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него остаются zstd и gzip
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard необязателен
+    zstandard = None
+
+# Ответы меньше этого размера (в байтах) не сжимаем: выигрыш меньше накладных расходов
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Сколько байт сжатых ответов держать в кэше
+COMPRESSION_CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", str(32 * 1024 * 1024)))
+# Ответы от этого размера (в байтах) сжимаются в threadpool, чтобы не блокировать цикл событий
+COMPRESSION_THREAD_MIN_SIZE = int(os.getenv("COMPRESSION_THREAD_MIN_SIZE", str(64 * 1024)))
+
+# Уровни сжатия по умолчанию. Шкалы у алгоритмов разные: gzip 1-9, brotli 0-11, zstd 1-22
+DEFAULT_LEVELS = {"gzip": 6, "br": 5, "zstd": 3}
+
+# Уровни сжатия для отдельных маршрутов (по префиксу пути).
+# Большие повторяющиеся списки выгоднее сжимать сильнее и отдавать из кэша сжатых тел.
+# Можно переопределить JSON-строкой в COMPRESSION_ROUTE_LEVELS
+ROUTE_LEVELS: Dict[str, Dict[str, int]] = json.loads(os.getenv("COMPRESSION_ROUTE_LEVELS", "null")) or {
+    "/api/by_location": {"gzip": 9, "br": 9, "zstd": 9},
+    "/api/by_activity_hierarchy": {"gzip": 9, "br": 9, "zstd": 9},
+}
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def _compress(encoding: str, body: bytes, level: int) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+# Порядок предпочтения сервера при одинаковом q у клиента
+SUPPORTED_ENCODINGS = tuple(
+    encoding for encoding, available in (("zstd", zstandard), ("br", brotli), ("gzip", gzip)) if available
+)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """
+    Выбирает алгоритм сжатия по заголовку Accept-Encoding с учётом q-значений
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def route_levels(path: str) -> Dict[str, int]:
+    for prefix, levels in ROUTE_LEVELS.items():
+        if path.startswith(prefix):
+            return {**DEFAULT_LEVELS, **levels}
+    return DEFAULT_LEVELS
+
+
+class CompressedBodyCache:
+    """
+    LRU-кэш сжатых тел, ограниченный суммарным размером.
+    Ключ — (хэш тела, алгоритм, уровень): повторный ответ с тем же телом отдаётся без повторного сжатия.
+    ETag для ключа не годится: версии данных кэшируются в процессе (utils/data_version.py),
+    и после записи из другого воркера новое тело какое-то время приходит со старым ETag.
+    """
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: "OrderedDict[Tuple[bytes, str, int], bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[bytes]:
+        body = self._items.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return body
+
+    @staticmethod
+    def key(body: bytes, encoding: str, level: int) -> Tuple[bytes, str, int]:
+        return hashlib.blake2b(body, digest_size=16).digest(), encoding, level
+
+    def put(self, key, body: bytes):
+        if len(body) > self.max_bytes or key in self._items:
+            return
+        self._items[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+
+compressed_cache = CompressedBodyCache()
+
+
+class CompressionMiddleware:
+    """
+    ASGI-middleware: сжимает ответы больше COMPRESSION_MIN_SIZE алгоритмом, выбранным по Accept-Encoding.
+    Потоковые ответы (тело из нескольких частей) пропускаются без изменений.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        encoding = negotiate(headers.get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        level = route_levels(scope["path"])[encoding]
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                if message["status"] == 304:
+                    # Клиент мог прислать ETag сжатой версии — возвращаем его же
+                    await send(_not_modified(message, headers.get("if-none-match", ""), encoding))
+                    start_message = None
+                return
+
+            if start_message is None:
+                return await send(message)
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            response_headers = [(key.decode("latin-1").lower(), value.decode("latin-1")) for key, value in start["headers"]]
+            header_values = dict(response_headers)
+            if (
+                message.get("more_body", False)
+                or len(body) < COMPRESSION_MIN_SIZE
+                or "content-encoding" in header_values
+                or not header_values.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(start)
+                return await send(message)
+
+            etag = header_values.get("etag")
+            # Кэшируем только ответы с ETag: остальные (ошибки, запись) обычно не повторяются
+            cache_key = compressed_cache.key(body, encoding, level) if etag else None
+            compressed = compressed_cache.get(cache_key) if cache_key else None
+            if compressed is None:
+                if len(body) >= COMPRESSION_THREAD_MIN_SIZE:
+                    compressed = await anyio.to_thread.run_sync(_compress, encoding, body, level)
+                else:
+                    compressed = _compress(encoding, body, level)
+                if cache_key:
+                    compressed_cache.put(cache_key, compressed)
+
+            vary = header_values.get("vary")
+            replaced = {
+                "content-encoding": encoding,
+                "content-length": str(len(compressed)),
+                "vary": f"{vary}, Accept-Encoding" if vary else "Accept-Encoding",
+            }
+            if etag:
+                # У сжатого представления свой сильный ETag
+                replaced["etag"] = etag_with_encoding(etag, encoding)
+            response_headers = [(key, value) for key, value in response_headers if key not in replaced]
+            response_headers.extend(replaced.items())
+
+            await send({
+                **start,
+                "headers": [(key.encode("latin-1"), value.encode("latin-1")) for key, value in response_headers],
+            })
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _not_modified(message, if_none_match: str, encoding: str):
+    headers = []
+    for key, value in message["headers"]:
+        if key.lower() == b"etag":
+            encoded = etag_with_encoding(value.decode("latin-1"), encoding)
+            if encoded in if_none_match:
+                value = encoded.encode("latin-1")
+        headers.append((key, value))
+    return {**message, "headers": headers}
@@ -0,0 +1,72 @@
+# Условные GET-запросы: ETag по версии данных и ответ 304 без выполнения запросов к сущностям
+import hashlib
+import os
+from typing import Dict, Optional
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session
+
+from database import get_db
+from utils.data_version import data_versions
+from utils.snapshot import dataset_snapshot
+
+# Заголовок Cache-Control для ответов с ETag: кэшировать можно, но перед использованием — перепроверять
+CACHE_CONTROL = os.getenv("CACHE_CONTROL", "public, no-cache")
+
+# Кодировки, для которых сжатые ответы получают ETag с суффиксом (см. utils/compression.py)
+ETAG_ENCODINGS = ("gzip", "br", "zstd")
+
+
+def make_etag(request: Request, versions: Dict[str, int]) -> str:
+    """
+    Сильный ETag: хэш пути, параметров запроса и версий всех таблиц справочника
+    """
+    query = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    state = ";".join(f"{entity}={version}" for entity, version in sorted(versions.items()))
+    digest = hashlib.sha1(f"{request.url.path}?{query}#{state}".encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_with_encoding(etag: str, encoding: str) -> str:
+    """
+    ETag сжатого представления: у разных кодировок одного ответа ETag должны различаться
+    """
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def strip_encoding(tag: str) -> str:
+    for encoding in ETAG_ENCODINGS:
+        suffix = f'-{encoding}"'
+        if tag.endswith(suffix):
+            return f'{tag[:-len(suffix)]}"'
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Для If-None-Match используется слабое сравнение, поэтому префикс W/ не учитываем.
+    # Суффикс кодировки тоже отбрасываем: данные те же, сжатие выберется заново
+    return any(strip_encoding(tag.strip().removeprefix("W/")) == etag for tag in if_none_match.split(","))
+
+
+def conditional_get(request: Request, response: Response, db: Session = Depends(get_db)):
+    """
+    Зависимость для GET-эндпоинтов: проставляет ETag и Cache-Control,
+    а если клиент уже имеет актуальную версию — сразу отвечает 304 Not Modified.
+    """
+    versions = data_versions.get(db)
+    if not versions:
+        # Версий нет (миграции не применены) — не можем гарантировать актуальность ETag
+        return
+
+    # Снимок справочника пересобирается в фоне и может отставать от версий данных:
+    # его версии тоже входят в ETag, иначе устаревший ответ закэшировался бы под новым ETag
+    snapshot_versions = {f"snapshot.{entity}": version for entity, version in dataset_snapshot.get(db).versions.items()}
+    etag = make_etag(request, {**versions, **snapshot_versions})
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
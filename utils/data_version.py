@@ -0,0 +1,46 @@
+# Версии данных справочника (таблица data_versions) с коротким кэшем в памяти процесса
+import os
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import DataVersion
+
+# Сколько секунд доверяем прочитанным версиям, прежде чем перечитать их из БД
+DATA_VERSION_TTL_SECONDS = float(os.getenv("DATA_VERSION_TTL_SECONDS", "1"))
+
+DATA_VERSIONS = select(DataVersion.entity, DataVersion.version)
+
+
+class DataVersionCache:
+    """
+    Кэш версий данных. Версии читаются из БД не чаще одного раза в DATA_VERSION_TTL_SECONDS,
+    поэтому проверка «не изменились ли данные» почти всегда обходится без SQL.
+    """
+
+    def __init__(self, ttl: float = DATA_VERSION_TTL_SECONDS):
+        self.ttl = ttl
+        self._versions: Dict[str, int] = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> Dict[str, int]:
+        checked_at = self._checked_at
+        if checked_at is not None and time.monotonic() - checked_at < self.ttl:
+            return self._versions
+
+        with self._lock:
+            if self._checked_at is checked_at:
+                self._versions = dict(db.execute(DATA_VERSIONS).all())
+                self._checked_at = time.monotonic()
+        return self._versions
+
+    def invalidate(self):
+        """Заставляет перечитать версии при следующем обращении (например, после записи)"""
+        self._checked_at = None
+
+
+data_versions = DataVersionCache()
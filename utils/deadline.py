@@ -0,0 +1,189 @@
+# Дедлайны запросов: statement_timeout в PostgreSQL, проверки в Python и отмена запроса при уходе клиента
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+from logger.logging_templates import log_warning
+from utils.metrics import metrics
+
+# Дедлайн запроса к API по умолчанию, в секундах
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "5"))
+
+# Дедлайны отдельных маршрутов (по префиксу пути), 0 — без дедлайна.
+# Можно переопределить JSON-строкой в ROUTE_DEADLINES
+ROUTE_DEADLINES: Dict[str, float] = json.loads(os.getenv("ROUTE_DEADLINES", "null")) or {
+    "/api/by_location": 3,
+    "/api/by_name": 2,
+    "/api/bulk": 0,
+}
+DEADLINE_PREFIX = "/api"
+
+# Код ошибки PostgreSQL query_canceled: сработал statement_timeout или запрос отменён
+QUERY_CANCELED = "57014"
+
+
+class DeadlineExceeded(Exception):
+    """Запрос не уложился в дедлайн или был отменён, потому что клиент ушёл"""
+
+
+class Deadline:
+    """
+    Дедлайн одного запроса. Знает соединения с БД, на которых сейчас выполняется запрос,
+    чтобы отменить SQL, если клиент отключился.
+    """
+
+    def __init__(self, route: str, seconds: float):
+        self.route = route
+        self.expires_at = time.monotonic() + seconds if seconds > 0 else math.inf
+        self.cancelled = False
+        self._connections = []
+        self._finished = False
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def check(self):
+        if self.cancelled:
+            raise DeadlineExceeded("Клиент отключился")
+        if self.remaining() <= 0:
+            raise DeadlineExceeded("Превышено время выполнения запроса")
+
+    def attach(self, dbapi_connection):
+        with self._lock:
+            if not self._finished:
+                self._connections.append(dbapi_connection)
+
+    def release(self):
+        """Запрос закончил работу с БД: соединения возвращаются в пул и отменять их больше нельзя"""
+        with self._lock:
+            self._finished = True
+            self._connections.clear()
+
+    def cancel(self):
+        with self._lock:
+            if self._finished:
+                return
+            self.cancelled = True
+            for dbapi_connection in self._connections:
+                # psycopg2 позволяет отменить выполняющийся запрос из другого потока
+                dbapi_connection.cancel()
+
+
+class _NoDeadline(Deadline):
+    def __init__(self):
+        super().__init__("", 0)
+
+    def check(self):
+        pass
+
+
+NO_DEADLINE = _NoDeadline()
+
+
+def deadline_of(db) -> Deadline:
+    """Дедлайн текущего запроса из сессии БД (см. get_db)"""
+    return db.info.get("deadline") or NO_DEADLINE
+
+
+def apply_statement_timeout(session, transaction, connection):
+    """
+    В начале каждой транзакции ограничиваем её SQL оставшимся временем запроса
+    """
+    deadline = session.info.get("deadline")
+    if deadline is None or deadline.expires_at == math.inf:
+        return
+    deadline.check()
+    if connection.dialect.name != "postgresql":
+        return
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(deadline.remaining() * 1000))}")
+    deadline.attach(connection.connection.dbapi_connection)
+    # Соединение работает на дедлайн запроса, пока не вернётся в пул (см. _forget_deadline)
+    connection.info["deadline"] = deadline
+
+
+@event.listens_for(Pool, "checkin")
+def _forget_deadline(dbapi_connection, connection_record):
+    connection_record.info.pop("deadline", None)
+
+
+@event.listens_for(Engine, "handle_error")
+def _query_canceled(context):
+    # Отменённый запрос с дедлайном — это не ошибка сервера, а исчерпанный дедлайн.
+    # Таймауты без дедлайна (пакетная запись, boot, миграции) остаются обычными ошибками SQLAlchemy
+    if getattr(context.original_exception, "pgcode", None) != QUERY_CANCELED:
+        return
+    if context.connection is not None and context.connection.info.get("deadline") is not None:
+        raise DeadlineExceeded("SQL-запрос отменён по дедлайну") from context.original_exception
+
+
+def route_deadline(path: str) -> Tuple[str, float]:
+    """Маршрут (для метрик) и его дедлайн в секундах"""
+    for prefix, seconds in ROUTE_DEADLINES.items():
+        if path.startswith(prefix):
+            return prefix, seconds
+    return "/".join(path.split("/")[:3]), REQUEST_DEADLINE_SECONDS
+
+
+class DeadlineMiddleware:
+    """
+    ASGI-middleware: создаёт дедлайн запроса (он доступен как request.state.deadline)
+    и следит за отключением клиента, чтобы отменить выполняющийся SQL.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(DEADLINE_PREFIX):
+            return await self.app(scope, receive, send)
+
+        deadline = Deadline(*route_deadline(scope["path"]))
+        scope.setdefault("state", {})["deadline"] = deadline
+        messages = asyncio.Queue()
+
+        async def watch_disconnect():
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not deadline._finished:
+                        metrics.inc("deadline.client_disconnects")
+                    deadline.cancel()
+                    return
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await self.app(scope, messages.get, send)
+        finally:
+            deadline.release()
+            watcher.cancel()
+
+
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    deadline = getattr(request.state, "deadline", NO_DEADLINE)
+    metrics.inc("deadline.exceeded")
+    if deadline.route:
+        metrics.inc(f"deadline.exceeded.{deadline.route}")
+    log_warning(
+        action="Дедлайн запроса",
+        message=f"{request.url.path}: {str(exc)}"
+    )
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": {
+            "status": "error",
+            "message": "Превышено время выполнения запроса",
+            "data": None,
+        }},
+    )
@@ -0,0 +1,130 @@
+# Кэш готовых JSON-фрагментов организаций: списки собираются склейкой байтов без повторной сериализации
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Sequence, Tuple
+
+from fastapi import Response
+from sqlalchemy.orm import Session
+
+import queries
+from schemas import OrganizationRequestSchema
+from utils.deadline import deadline_of
+from utils.metrics import metrics
+
+# Сколько байт фрагментов держать в памяти процесса
+FRAGMENT_CACHE_BYTES = int(os.getenv("FRAGMENT_CACHE_BYTES", str(16 * 1024 * 1024)))
+
+# Через сколько сериализованных организаций проверять дедлайн запроса
+ENCODE_CHUNK_SIZE = 1000
+
+# Заголовки, которые выставляет сам Response по телу ответа
+_BODY_HEADERS = ("content-length", "content-type")
+
+
+def dumps(value) -> bytes:
+    # Те же параметры, что у JSONResponse в FastAPI: фрагменты совпадают с обычной сериализацией байт в байт
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def to_schema(row) -> OrganizationRequestSchema:
+    """
+    Переделывает строку модели чтения organization_read_model в Pydantic-схему ответа
+    """
+    return OrganizationRequestSchema(
+        id=row.id,
+        name=row.name,
+        phone_numbers=row.phone_numbers,
+        activities=row.activity_names,
+        address=row.address,
+        latitude=row.latitude,
+        longitude=row.longitude
+    )
+
+
+class FragmentCache:
+    """
+    LRU-кэш JSON организаций, ограниченный суммарным размером.
+    Фрагмент хранится вместе с fingerprint строки модели чтения: если организация, её здание
+    или её виды деятельности изменились, fingerprint другой и фрагмент собирается заново.
+    Обработчики выполняются в threadpool, поэтому доступ под блокировкой.
+    """
+
+    def __init__(self, max_bytes: int = FRAGMENT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: "OrderedDict[int, Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        metrics.gauge("fragments.bytes", lambda: self.size)
+        metrics.gauge("fragments.items", lambda: len(self._items))
+
+    def _put(self, organization_id: int, fingerprint: str, fragment: bytes):
+        if len(fragment) > self.max_bytes:
+            return
+        previous = self._items.pop(organization_id, None)
+        if previous is not None:
+            self.size -= len(previous[1])
+        self._items[organization_id] = (fingerprint, fragment)
+        self.size += len(fragment)
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+    def get_many(self, db: Session, rows: Sequence[Tuple[int, str]]) -> List[bytes]:
+        """
+        Фрагменты для строк (id, fingerprint) в том же порядке.
+        Недостающие и устаревшие организации дочитываются из модели чтения одним запросом.
+        Сериализация длинных списков прерывается по дедлайну запроса (DeadlineExceeded).
+        """
+        deadline = deadline_of(db)
+        found: Dict[int, bytes] = {}
+        missing = []
+        with self._lock:
+            for organization_id, fingerprint in rows:
+                item = self._items.get(organization_id)
+                if item is not None and item[0] == fingerprint:
+                    self._items.move_to_end(organization_id)
+                    found[organization_id] = item[1]
+                else:
+                    missing.append(organization_id)
+        metrics.inc("fragments.hits", len(found))
+
+        if missing:
+            metrics.inc("fragments.misses", len(missing))
+            encoded = []
+            try:
+                for row in db.execute(queries.READ_MODEL_ROWS_BY_IDS, {"organization_ids": missing}):
+                    if len(encoded) % ENCODE_CHUNK_SIZE == 0:
+                        deadline.check()
+                    encoded.append((row.id, row.fingerprint, dumps(to_schema(row).model_dump())))
+            finally:
+                # Уже сериализованное сохраняем и при исчерпании дедлайна: повторный запрос дойдёт дальше
+                with self._lock:
+                    for organization_id, fingerprint, fragment in encoded:
+                        self._put(organization_id, fingerprint, fragment)
+                        found[organization_id] = fragment
+
+        # Дальше обработчик склеивает тело ответа: не тратим на это время, если дедлайн уже истёк
+        deadline.check()
+        # Организация могла исчезнуть между запросами — её просто не будет в ответе
+        return [found[organization_id] for organization_id, _ in rows if organization_id in found]
+
+
+fragment_cache = FragmentCache()
+
+
+def fragments_response(*, message: str, data: bytes, response: Response) -> Response:
+    """
+    Ответ в формате success_response, где data — уже готовый JSON.
+    Заголовки, выставленные зависимостями (ETag, Cache-Control), переносятся вручную:
+    при возврате Response FastAPI их сам не добавляет.
+    """
+    body = b'{"status":"success","message":' + dumps(message) + b',"data":' + data + b',"extras":null}'
+    headers = {key: value for key, value in response.headers.items() if key not in _BODY_HEADERS}
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def join_fragments(fragments: List[bytes]) -> bytes:
+    return b"[" + b",".join(fragments) + b"]"
@@ -0,0 +1,33 @@
+# Простые метрики процесса: счётчики и измеряемые на лету значения
+import threading
+from collections import defaultdict
+from typing import Callable, Dict
+
+
+class Metrics:
+    """
+    Реестр метрик в памяти процесса.
+    Счётчики увеличиваются через inc(), а текущие значения (gauge) вычисляются функциями в момент снимка.
+    """
+
+    def __init__(self):
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def gauge(self, name: str, func: Callable[[], float]):
+        self._gauges[name] = func
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            result = dict(self._counters)
+        for name, func in list(self._gauges.items()):
+            result[name] = func()
+        return dict(sorted(result.items()))
+
+
+metrics = Metrics()
@@ -0,0 +1,172 @@
+# Выборочный профилировщик запросов: стеки пишутся в формате collapsed (flamegraph.pl, speedscope)
+import asyncio
+import contextvars
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+
+from logger.logging_config import LOG_DIR
+from logger.logging_templates import log_info, log_error
+
+# Токен для заголовка X-Profile: запрос с ним профилируется. Не задан — по заголовку профилировать нельзя
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+# Доля случайно профилируемых запросов к API (0 — выключено)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Интервал снятия стеков, в секундах
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.002"))
+PROFILE_DIR = os.path.join(LOG_DIR, "profiles")
+PROFILE_PREFIX = "/api"
+
+# Какой профиль относится к текущему запросу. Переменная контекста копируется и в потоки threadpool,
+# где выполняются синхронные обработчики
+_current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+# Одновременно профилируем не больше одного запроса, чтобы не умножать накладные расходы
+_profiling = threading.Lock()
+
+_UNSAFE = re.compile(r"[^\w.-]+")
+
+
+def profiling_enabled() -> bool:
+    return bool(PROFILE_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+
+class RequestProfile:
+    """
+    Сэмплер одного запроса: фоновый поток раз в PROFILE_INTERVAL_SECONDS снимает стеки всех потоков
+    и оставляет те, что выполняют этот запрос — корутины, вызванные из его middleware, в цикле событий
+    и задачи threadpool, запущенные из его контекста.
+    На каждом тике просматриваются только f_code и ссылки между кадрами: переменные кадров (f_locals)
+    читаются один раз на задачу threadpool, а не на каждый кадр каждого потока.
+    """
+
+    def __init__(self, scope, root_frame):
+        self.scope = scope
+        # Кадр корутины ProfilingMiddleware: стек цикла событий относится к запросу, если проходит через него
+        self.root_frame = root_frame
+        # Создаётся в потоке цикла событий: только здесь выполняются корутины запроса
+        self.loop_thread = threading.get_ident()
+        self.samples = Counter()
+        # Корневые кадры задач threadpool, уже проверенные на принадлежность запросу
+        self._jobs = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self.root_frame = None
+        self._jobs.clear()
+
+    def _run(self):
+        own_thread = threading.get_ident()
+        while not self._stopped.wait(PROFILE_INTERVAL_SECONDS):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = self._stack_of_request(frame, thread_id == self.loop_thread)
+                if stack:
+                    self.samples[";".join(stack)] += 1
+
+    def _is_request_job(self, frame, child) -> bool:
+        """
+        Поток threadpool (anyio) выполняет задачу через context.run(...) в WorkerThread.run.
+        Простаивающий поток ждёт следующую задачу в queue.get, а контекст прошлой задачи ещё лежит
+        в его переменных. Контекст задачи проверяем один раз — по первому кадру задачи (child)
+        """
+        code = frame.f_code
+        if child is None or code.co_name != "run" or "anyio" not in code.co_filename:
+            return False
+        if child.f_code.co_filename.endswith("queue.py"):
+            return False
+        ours = self._jobs.get(child)
+        if ours is None:
+            context = frame.f_locals.get("context")
+            ours = isinstance(context, contextvars.Context) and context.get(_current_profile) is self
+            self._jobs[child] = ours
+        return ours
+
+    def _stack_of_request(self, frame, in_loop: bool) -> Optional[List[str]]:
+        stack = []
+        ours = False
+        child = None
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            if not ours:
+                ours = frame is self.root_frame if in_loop else self._is_request_job(frame, child)
+            frame, child = frame.f_back, frame
+        return stack[::-1] if ours else None
+
+    def write(self, seconds: float) -> str:
+        """
+        Сохраняет профиль в logs/profiles. Корень каждого стека — метод, путь и параметры запроса,
+        поэтому на флеймграфе сразу видно, что именно профилировалось.
+        """
+        path = self.scope["path"]
+        query = self.scope.get("query_string", b"").decode("latin-1")
+        root = f"{self.scope['method']} {path}{'?' + query if query else ''}".replace(";", ",").replace(" ", "_")
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        file_name = f"{datetime.now():%Y%m%d-%H%M%S-%f}_{_UNSAFE.sub('_', path).strip('_')}_{int(seconds * 1000)}ms.collapsed"
+        with open(os.path.join(PROFILE_DIR, file_name), "w", encoding="utf-8") as file:
+            for stack, count in self.samples.items():
+                file.write(f"{root};{stack} {count}\n")
+        return file_name
+
+
+class ProfilingMiddleware:
+    """
+    ASGI-middleware: профилирует обработчик и сериализацию ответа, если передан заголовок
+    X-Profile с верным токеном или запрос попал в случайную выборку PROFILE_SAMPLE_RATE.
+    Подключается только при включённом профилировании (см. profiling_enabled).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _wants_profile(self, scope) -> bool:
+        if PROFILE_TOKEN:
+            for name, value in scope["headers"]:
+                if name == b"x-profile":
+                    # Сравниваем байты: compare_digest не принимает строки с не-ASCII символами
+                    return secrets.compare_digest(value, PROFILE_TOKEN.encode("utf-8"))
+        return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(PROFILE_PREFIX) or not self._wants_profile(scope):
+            return await self.app(scope, receive, send)
+        if not _profiling.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+
+        # sys._getframe() в корутине — её собственный кадр: через него проходят стеки всех корутин запроса
+        profile = RequestProfile(scope, sys._getframe())
+        token = _current_profile.set(profile)
+        started_at = time.perf_counter()
+        profile.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profile.stop()
+            _current_profile.reset(token)
+            _profiling.release()
+            seconds = time.perf_counter() - started_at
+            try:
+                file_name = await asyncio.to_thread(profile.write, seconds)
+                log_info(
+                    action="Профилирование запроса",
+                    message=f"{scope['path']}: {sum(profile.samples.values())} сэмплов за {seconds:.3f} с, файл {file_name}"
+                )
+            except OSError as e:
+                log_error(action="Профилирование запроса", message=f"Не удалось сохранить профиль: {str(e)}")
@@ -0,0 +1,21 @@
+# Обновление модели чтения organization_read_model после записи в справочник
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# CONCURRENTLY не блокирует чтение представления на время пересчёта
+REFRESH_READ_MODEL = text("REFRESH MATERIALIZED VIEW CONCURRENTLY organization_read_model")
+
+# Триггеры на пересчёт представления не срабатывают, поэтому его версию увеличиваем явно
+BUMP_READ_MODEL_VERSION = text(
+    "UPDATE data_versions SET version = version + 1 WHERE entity = 'organization_read_model'"
+)
+
+
+def refresh_read_model(db: Session):
+    """
+    Пересчитывает модель чтения в текущей транзакции и увеличивает её версию в data_versions.
+    Вызывается перед commit, чтобы новые данные и модель чтения стали видны одновременно
+    (и ETag по версиям данных не разошёлся с содержимым ответа).
+    """
+    db.execute(REFRESH_READ_MODEL)
+    db.execute(BUMP_READ_MODEL_VERSION)
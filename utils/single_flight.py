@@ -0,0 +1,93 @@
+# Объединение одинаковых одновременных запросов (single flight)
+import functools
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from fastapi import Response
+from sqlalchemy.orm import Session
+
+from logger.logging_templates import log_debug
+from utils.deadline import DeadlineExceeded
+from utils.metrics import metrics
+
+# Сколько секунд запрос ждёт результат уже выполняющегося такого же запроса, прежде чем выполнить его сам
+COALESCE_WAIT_TIMEOUT = float(os.getenv("COALESCE_WAIT_TIMEOUT", "2"))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Одновременные вызовы с одинаковым ключом ждут один вычисляемый результат и получают его же
+    (или то же исключение). Результат не кэшируется: как только вычисление завершилось,
+    следующий вызов выполнится заново, поэтому устаревших данных не появляется.
+    Исключение DeadlineExceeded не передаётся: дедлайн и отключение клиента касаются только лидера,
+    поэтому ожидавшие вызовы выполняются заново (и снова объединяются между собой).
+    """
+
+    def __init__(self, wait_timeout: float = COALESCE_WAIT_TIMEOUT):
+        self.wait_timeout = wait_timeout
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        metrics.gauge("coalesce.in_flight", lambda: len(self._calls))
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            metrics.inc("coalesce.executed")
+            try:
+                call.result = func()
+                return call.result
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if not call.done.wait(self.wait_timeout):
+            # Не дождались — выполняем сами, чтобы ожидание было ограничено
+            metrics.inc("coalesce.wait_timeouts")
+            return func()
+
+        if isinstance(call.error, DeadlineExceeded):
+            # Дедлайн и отключение клиента — свойства запроса-лидера, а не результата: у этого запроса свой дедлайн
+            metrics.inc("coalesce.leader_deadline_retries")
+            return self.do(key, func)
+
+        metrics.inc("coalesce.coalesced")
+        log_debug(action="Объединение запросов", message=f"Результат получен от такого же запроса: {key}")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+requests_in_flight = SingleFlight()
+
+
+def single_flight(func):
+    """
+    Декоратор эндпоинта: одинаковые одновременные запросы (тот же эндпоинт и те же параметры)
+    выполняются один раз. Сессия БД и Response для заголовков в ключ не входят — их использует только первый запрос.
+    """
+
+    @functools.wraps(func)
+    def wrapper(**kwargs):
+        key = (func.__name__,) + tuple(
+            sorted((name, value) for name, value in kwargs.items() if not isinstance(value, (Session, Response)))
+        )
+        return requests_in_flight.do(key, lambda: func(**kwargs))
+
+    return wrapper
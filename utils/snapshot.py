@@ -0,0 +1,293 @@
+# Бинарный снимок справочника, общий для всех воркеров через mmap
+import fcntl
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from typing import Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from logger.logging_templates import log_info, log_error
+from models import Activity, Building, Organization
+from utils.data_version import data_versions
+
+# Файл снимка. Воркеры на одной машине должны видеть один и тот же путь
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "snapshot/dataset.bin")
+
+# Таблицы, из которых собирается снимок: по их версиям понимаем, что он устарел
+SNAPSHOT_ENTITIES = ("activities", "buildings", "organizations")
+
+BUILDING_ROWS = select(Building.id, Building.latitude, Building.longitude).order_by(Building.id)
+ACTIVITY_ROWS = select(Activity.id, Activity.name, Activity.parent_id).order_by(Activity.id)
+ORGANIZATION_ROWS = select(Organization.id, Organization.name, Organization.building_id).order_by(Organization.id)
+
+MAGIC = b"NBSN"
+FORMAT_VERSION = 1
+# Заголовок: сигнатура, версия формата, длина JSON-описания секций
+HEADER = struct.Struct("<4sII")
+ALIGNMENT = 8
+# Вместо NULL в целочисленных колонках (родитель корня, здание организации)
+NO_ID = -1
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class StringTable:
+    """Строки одним блоком UTF-8 и массив смещений: i-я строка — data[offsets[i]:offsets[i + 1]]"""
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[index] for index in range(len(self)))
+
+
+def _string_columns(values) -> Tuple[array, bytes]:
+    offsets = array("q", [0])
+    data = bytearray()
+    for value in values:
+        data += value.encode("utf-8")
+        offsets.append(len(data))
+    return offsets, bytes(data)
+
+
+class Snapshot:
+    """
+    Снимок только для чтения поверх буфера (обычно mmap файла).
+    Колонки — memoryview без копирования, поэтому страницы файла делят все процессы.
+    Строки отсортированы по id, так что позицию сущности можно найти бинарным поиском.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        magic, format_version, meta_length = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError("Неизвестный формат снимка")
+        meta = json.loads(bytes(buffer[HEADER.size:HEADER.size + meta_length]))
+        if meta["byteorder"] != sys.byteorder:
+            raise ValueError("Снимок собран на машине с другим порядком байтов")
+
+        self.versions: Dict[str, int] = meta["versions"]
+        view = memoryview(buffer)
+        self._columns = {
+            name: view[offset:offset + size].cast(typecode)
+            for name, (offset, size, typecode) in meta["columns"].items()
+        }
+
+        self.building_ids = self._columns["building_id"]
+        self.building_latitudes = self._columns["building_latitude"]
+        self.building_longitudes = self._columns["building_longitude"]
+
+        self.activity_ids = self._columns["activity_id"]
+        self.activity_parent_ids = self._columns["activity_parent_id"]
+        self.activity_names = StringTable(self._columns["activity_name_offsets"], self._columns["activity_name_data"])
+
+        self.organization_ids = self._columns["organization_id"]
+        self.organization_building_ids = self._columns["organization_building_id"]
+        self.organization_names = StringTable(
+            self._columns["organization_name_offsets"], self._columns["organization_name_data"]
+        )
+
+    def is_current(self, versions: Dict[str, int]) -> bool:
+        # Снимок может оказаться новее закэшированных версий — такой тоже подходит
+        return all(self.versions.get(entity, -1) >= versions.get(entity, 0) for entity in SNAPSHOT_ENTITIES)
+
+    def activity_rows(self) -> Iterator[Tuple[int, str, Optional[int]]]:
+        """Строки (id, name, parent_id) для дерева видов деятельности"""
+        for index, activity_id in enumerate(self.activity_ids):
+            parent_id = self.activity_parent_ids[index]
+            yield activity_id, self.activity_names[index], None if parent_id == NO_ID else parent_id
+
+
+def build_snapshot(db: Session, versions: Dict[str, int]) -> bytes:
+    """Собирает снимок из таблиц справочника"""
+    buildings = db.execute(BUILDING_ROWS).all()
+    activities = db.execute(ACTIVITY_ROWS).all()
+    organizations = db.execute(ORGANIZATION_ROWS).all()
+
+    activity_name_offsets, activity_name_data = _string_columns(a.name for a in activities)
+    organization_name_offsets, organization_name_data = _string_columns(o.name for o in organizations)
+    columns = {
+        "building_id": array("q", (b.id for b in buildings)),
+        "building_latitude": array("d", (b.latitude for b in buildings)),
+        "building_longitude": array("d", (b.longitude for b in buildings)),
+        "activity_id": array("q", (a.id for a in activities)),
+        "activity_parent_id": array("q", (NO_ID if a.parent_id is None else a.parent_id for a in activities)),
+        "activity_name_offsets": activity_name_offsets,
+        "activity_name_data": activity_name_data,
+        "organization_id": array("q", (o.id for o in organizations)),
+        "organization_building_id": array(
+            "q", (NO_ID if o.building_id is None else o.building_id for o in organizations)
+        ),
+        "organization_name_offsets": organization_name_offsets,
+        "organization_name_data": organization_name_data,
+    }
+
+    # Смещения колонок зависят от длины описания, а описание — от смещений:
+    # считаем раскладку, пока длина описания не перестанет меняться
+    meta_length = 0
+    while True:
+        offset = _align(HEADER.size + meta_length)
+        layout = {}
+        for name, column in columns.items():
+            size = len(column) * column.itemsize if isinstance(column, array) else len(column)
+            layout[name] = (offset, size, column.typecode if isinstance(column, array) else "B")
+            offset = _align(offset + size)
+        meta = json.dumps({
+            "byteorder": sys.byteorder,
+            "versions": {entity: versions.get(entity, 0) for entity in SNAPSHOT_ENTITIES},
+            "columns": layout,
+        }).encode("utf-8")
+        if len(meta) == meta_length:
+            break
+        meta_length = len(meta)
+
+    buffer = bytearray(offset)
+    HEADER.pack_into(buffer, 0, MAGIC, FORMAT_VERSION, meta_length)
+    buffer[HEADER.size:HEADER.size + meta_length] = meta
+    for name, column in columns.items():
+        start, size, _ = layout[name]
+        buffer[start:start + size] = column.tobytes() if isinstance(column, array) else column
+    return bytes(buffer)
+
+
+def write_snapshot(path: str, data: bytes):
+    """
+    Записывает снимок во временный файл рядом и атомарно подменяет старый через os.replace.
+    Процессы, которые уже отобразили старый файл, продолжают читать его, пока не переоткроют.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+
+def open_snapshot(path: str) -> Snapshot:
+    with open(path, "rb") as file:
+        # Отображение остаётся валидным и после закрытия файла и его подмены
+        return Snapshot(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class SnapshotStore:
+    """
+    Актуальный снимок для процесса. Если файл устарел по версиям данных, его пересобирает
+    один воркер (под файловой блокировкой), остальные дожидаются и открывают новый файл.
+    Пока идёт пересборка, запросы читают прежний снимок: новый собирается в фоновом потоке
+    и подменяет старый целиком. Ждать сборки приходится только первому запросу процесса.
+    В пределах одной сессии БД (запроса) снимок не меняется — см. get.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH):
+        self.path = path
+        self._snapshot: Optional[Snapshot] = None
+        self._file_id = None
+        self._rebuilding = False
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> Snapshot:
+        """
+        Снимок для запроса. Запоминается в сессии: ETag (utils/conditional.py) и ответ
+        строятся по одному и тому же снимку, даже если в середине запроса его подменят.
+        """
+        snapshot = db.info.get("snapshot")
+        if snapshot is None:
+            snapshot = db.info["snapshot"] = self._current(db)
+        return snapshot
+
+    def _current(self, db: Session) -> Snapshot:
+        versions = data_versions.get(db)
+        snapshot = self._snapshot
+        if snapshot is not None:
+            if not snapshot.is_current(versions):
+                self._rebuild_in_background(db, versions)
+            return snapshot
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = self._refresh(db, versions)
+            return self._snapshot
+
+    def _rebuild_in_background(self, db: Session, versions: Dict[str, int]):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        # Сессия запроса закроется раньше, чем закончится сборка: потоку нужна своя.
+        # db.bind — основная база: реплика может отставать от версий, по которым снимок будет помечен
+        thread = threading.Thread(target=self._rebuild, args=(db.bind, versions), name="snapshot-rebuild", daemon=True)
+        thread.start()
+
+    def _rebuild(self, bind, versions: Dict[str, int]):
+        try:
+            with Session(bind) as db:
+                snapshot = self._refresh(db, versions)
+            self._snapshot = snapshot
+        except Exception as e:
+            # Продолжаем отдавать прежний снимок, следующий запрос попробует ещё раз
+            log_error(action="Снимок справочника", message=f"Не удалось пересобрать снимок: {str(e)}")
+        finally:
+            self._rebuilding = False
+
+    def _open_if_current(self, versions: Dict[str, int]) -> Optional[Snapshot]:
+        """Открывает файл снимка, если он подходит по версиям (или уже открыт)"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        file_id = (stat.st_ino, stat.st_mtime_ns)
+        if file_id == self._file_id and self._snapshot is not None:
+            snapshot = self._snapshot
+        else:
+            try:
+                snapshot = open_snapshot(self.path)
+            except (OSError, ValueError) as e:
+                log_error(action="Снимок справочника", message=f"Не удалось открыть {self.path}: {str(e)}")
+                return None
+            self._file_id = file_id
+        return snapshot if snapshot.is_current(versions) else None
+
+    def _refresh(self, db: Session, versions: Dict[str, int]) -> Snapshot:
+        snapshot = self._open_if_current(versions)
+        if snapshot is not None:
+            return snapshot
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(f"{self.path}.lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                # Пока ждали блокировку, снимок мог пересобрать другой воркер
+                snapshot = self._open_if_current(versions)
+                if snapshot is None:
+                    write_snapshot(self.path, build_snapshot(db, versions))
+                    snapshot = self._open_if_current(versions)
+                    log_info(
+                        action="Снимок справочника",
+                        message=f"Снимок пересобран: {len(snapshot.building_ids)} зданий, "
+                                f"{len(snapshot.activity_ids)} видов деятельности, "
+                                f"{len(snapshot.organization_ids)} организаций"
+                    )
+        except OSError as e:
+            # Нет доступа к файлу — работаем со снимком в памяти этого процесса
+            log_error(action="Снимок справочника", message=f"Не удалось записать {self.path}: {str(e)}")
+            snapshot = None
+        return snapshot or Snapshot(build_snapshot(db, versions))
+
+
+dataset_snapshot = SnapshotStore()
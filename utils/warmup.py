@@ -0,0 +1,133 @@
+# Прогрев воркера при старте: соединения, мапперы, кэш скомпилированных запросов и кэши в памяти
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import configure_mappers
+
+import queries
+from database import REPLICA_EJECT_SECONDS, SessionLocal, engine, replica_pool
+from logger.logging_templates import log_info, log_error
+from utils.activity_tree import activity_tree
+from utils.autocomplete import autocomplete
+from utils.data_version import data_versions
+from utils.snapshot import dataset_snapshot
+
+
+def _pool_size(pool) -> int:
+    """
+    Размер пула соединений. У QueuePool это метод size(), у SingletonThreadPool (SQLite в памяти) —
+    число, у StaticPool и NullPool его нет вовсе: там заранее открывать больше одного соединения незачем
+    """
+    size = getattr(pool, "size", None)
+    if callable(size):
+        size = size()
+    return size if isinstance(size, int) else 1
+
+
+# Сколько соединений открыть заранее в каждом пуле (по умолчанию — размер пула)
+WARMUP_POOL_CONNECTIONS = int(os.getenv("WARMUP_POOL_CONNECTIONS", str(_pool_size(engine.pool))))
+# Пауза между попытками прогрева, если база недоступна, в секундах
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+
+# Горячие запросы с параметрами, которые ничего не находят: выполняются быстро,
+# но SQLAlchemy компилирует и кэширует SQL так же, как для настоящих запросов
+HOT_STATEMENTS = [
+    (queries.READ_MODEL_BY_ID, {"organization_id": -1}),
+    (queries.READ_MODEL_BY_BUILDING, {"building_id": -1}),
+    (queries.READ_MODEL_BY_BUILDINGS, {"building_ids": [-1]}),
+    (queries.READ_MODEL_BY_ACTIVITY, {"activity_id": -1}),
+    (queries.READ_MODEL_BY_ACTIVITIES, {"activity_ids": [-1]}),
+    (queries.READ_MODEL_BY_NAME, {"pattern": ""}),
+    (queries.READ_MODEL_ROWS_BY_IDS, {"organization_ids": [-1]}),
+    (queries.READ_MODEL_IN_RECTANGLE, {"min_lat": 1, "max_lat": 0, "min_lon": 1, "max_lon": 0}),
+    (queries.activity_counts(False, True, False, False, False), {"building_id": -1}),
+    (queries.activity_counts(True, True, False, False, False), {"building_id": -1}),
+]
+
+
+class WarmupState:
+    """Ход прогрева: готов ли воркер и сколько занял каждый этап"""
+
+    def __init__(self):
+        self.ready = False
+        self.error: Optional[str] = None
+        self.stages: Dict[str, float] = {}
+        self.stopped = threading.Event()
+
+    def stage(self, name: str, started_at: float):
+        self.stages[name] = round(time.perf_counter() - started_at, 3)
+
+
+warmup_state = WarmupState()
+
+
+def _open_pool(pool_engine, connections: int):
+    """Открывает соединения одновременно, чтобы пул действительно наполнился, и возвращает их в пул"""
+    opened = []
+    try:
+        for _ in range(min(connections, _pool_size(pool_engine.pool))):
+            connection = pool_engine.connect()
+            opened.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
+
+
+def warm_up():
+    state = warmup_state
+
+    started_at = time.perf_counter()
+    configure_mappers()
+    state.stage("мапперы", started_at)
+
+    started_at = time.perf_counter()
+    _open_pool(engine, WARMUP_POOL_CONNECTIONS)
+    for replica in replica_pool.replicas:
+        try:
+            _open_pool(replica.engine, WARMUP_POOL_CONNECTIONS)
+        except SQLAlchemyError as e:
+            # Недоступная реплика не мешает готовности: чтение уйдёт на другие реплики или в основную БД
+            replica.eject(f"ошибка при прогреве: {str(e)}", REPLICA_EJECT_SECONDS)
+    state.stage("пул соединений", started_at)
+
+    with SessionLocal() as db:
+        db.info["read_only"] = True
+
+        started_at = time.perf_counter()
+        for statement, params in HOT_STATEMENTS:
+            db.execute(statement, params).all()
+        state.stage("запросы", started_at)
+
+        started_at = time.perf_counter()
+        data_versions.get(db)
+        dataset_snapshot.get(db)
+        tree = activity_tree.load(db)
+        autocomplete.get(db)
+        state.stage("кэши", started_at)
+
+    log_info(
+        action="Прогрев воркера",
+        message=f"Готово, видов деятельности: {len(tree.names)}",
+        **state.stages
+    )
+
+
+def run_warmup():
+    """
+    Прогрев в фоне: повторяется, пока не удастся (например, пока база не стала доступна).
+    До успешного завершения /health/ready отвечает 503.
+    """
+    while not warmup_state.stopped.is_set():
+        try:
+            warm_up()
+            warmup_state.ready, warmup_state.error = True, None
+            return
+        except Exception as e:
+            warmup_state.error = str(e)
+            log_error(action="Прогрев воркера", message=f"Не удалось прогреть воркер: {str(e)}")
+            warmup_state.stopped.wait(WARMUP_RETRY_SECONDS)